@@ -0,0 +1,268 @@
+# HamRadio Logbook - Banco de pruebas de rendimiento
+
+#### IMPORTAR MÓDULOS ####
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+import funciones
+
+#### CONSTANTES ####
+TAMANOS_PREDETERMINADOS = [1000, 100000]
+SEMILLA_PREDETERMINADA = 73
+PAGINAS_LISTADO = 50  # Páginas recorridas en la prueba de listado
+CONSULTAS_DETALLE = 1000  # Entradas consultadas por ID
+CONSULTAS_BANDA = 100000  # Frecuencias resueltas en la prueba de bandas
+# Filtros que deben resolverse con un índice: su plan no puede recorrer logbook entero
+FILTROS_INDEXADOS = {
+    'detalle': {'id': 1},
+    'incremental': {'id_despues': 1000, 'id_hasta': 2000},
+    'indicativo': {'indicativo': 'EA8ABC'},
+    'prefijo': {'indicativo': 'EA8*'},
+    'prefijo_modo_fechas': {'indicativo': 'EA*', 'modos': ['CW'], 'desde': 1577836800},  # Desde 2020-01-01 UTC
+    'rango_fechas': {'desde': 1577836800, 'hasta': 1609459200},  # Año 2020 UTC
+    'bandas': {'bandas': ['20m', '40m']},
+    'bandas_distancia': {'bandas': ['6m', '2m'], 'distancia_minima': 1000},
+    'bandas_modo_locator': {'bandas': ['20m'], 'modos': ['FT8'], 'con_locator': True},
+    'creadas_en_un_dia': {'creado_desde': '2025-01-01', 'creado_hasta': '2025-01-02'},
+}
+RE_RECORRIDO_COMPLETO = re.compile(r'^SCAN (TABLE )?(\w+\.)?logbook\b')
+
+# Frecuencias típicas (MHz) y peso relativo de cada banda en un log real
+FRECUENCIAS_BANDA = {
+    '160m': ([1.840, 1.830, 1.910], 2),
+    '80m': ([3.573, 3.525, 3.750], 6),
+    '40m': ([7.074, 7.030, 7.150], 14),
+    '30m': ([10.136, 10.120], 6),
+    '20m': ([14.074, 14.030, 14.250], 25),
+    '17m': ([18.100, 18.080, 18.130], 8),
+    '15m': ([21.074, 21.030, 21.300], 12),
+    '12m': ([24.915, 24.900], 5),
+    '10m': ([28.074, 28.030, 28.500], 14),
+    '6m': ([50.313, 50.150], 4),
+    '2m': ([144.174, 145.500], 3),
+    '70cm': ([432.174, 433.500], 1),
+}
+MODOS = {'FT8': 45, 'SSB': 20, 'CW': 18, 'FT4': 8, 'RTTY': 4, 'FM': 3, 'PSK31': 2}
+PREFIJOS = ['EA', 'EA8', 'CX', 'LU', 'PY', 'K', 'W', 'N', 'DL', 'F', 'G', 'I', 'JA', 'VK', 'ZL', 'VE', 'OH', 'SP', 'UA', 'YB']
+NOMBRES = ['Juan', 'María', 'Pedro', 'Ana', 'John', 'Hans', 'Yuki', 'Luca', 'Olga', 'Pierre']
+QTHS = ['Madrid', 'Montevideo', 'Buenos Aires', 'Tenerife', 'Berlin', 'Tokyo', 'Sydney', 'Ohio', 'Roma']
+
+#### GENERACIÓN DE DATOS ####
+def campo_adif(tag, valor):
+    """Codifica un campo ADIF con su longitud"""
+    return f"<{tag}:{len(valor.encode('utf-8'))}>{valor} "
+
+def generar_indicativo(rnd):
+    """Genera un indicativo verosímil: prefijo, número y sufijo de 1 a 3 letras"""
+    sufijo = ''.join(rnd.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for _ in range(rnd.randint(1, 3)))
+    return f"{rnd.choice(PREFIJOS)}{rnd.randint(0, 9)}{sufijo}"
+
+def generar_locator(rnd):
+    """Genera un grid locator de 4 o 6 caracteres"""
+    locator = (rnd.choice('ABCDEFGHIJKLMNOPQR') + rnd.choice('ABCDEFGHIJKLMNOPQR') +
+               str(rnd.randint(0, 9)) + str(rnd.randint(0, 9)))
+    if rnd.random() < 0.6:
+        locator += rnd.choice('abcdefghijklmnopqrstuvwx') + rnd.choice('abcdefghijklmnopqrstuvwx')
+    return locator
+
+def generar_adif(ruta, registros, semilla=SEMILLA_PREDETERMINADA):
+    """Escribe un log ADIF sintético con bandas, modos y campos opcionales mezclados"""
+    rnd = random.Random(semilla)
+    bandas = list(FRECUENCIAS_BANDA)
+    pesos_banda = [FRECUENCIAS_BANDA[b][1] for b in bandas]
+    modos = list(MODOS)
+    pesos_modo = list(MODOS.values())
+
+    # Contactos repartidos en los últimos diez años, en orden cronológico como un log real
+    inicio = datetime.datetime(2015, 1, 1)
+    paso = 10 * 365 * 86400 / max(registros, 1)
+
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write("Log sintético generado por benchmark.py\n<ADIF_VER:5>3.1.0\n<PROGRAMID:9>benchmark\n<EOH>\n")
+        for i in range(registros):
+            banda = rnd.choices(bandas, pesos_banda)[0]
+            modo = rnd.choices(modos, pesos_modo)[0]
+            momento = inicio + datetime.timedelta(seconds=int(i * paso + rnd.random() * paso))
+            partes = [
+                campo_adif('CALL', generar_indicativo(rnd)),
+                campo_adif('BAND', banda.upper() if rnd.random() < 0.3 else banda),
+                campo_adif('MODE', modo),
+                f"<QSO_DATE:8:D>{momento.strftime('%Y%m%d')} ",
+                campo_adif('TIME_ON', momento.strftime('%H%M%S' if rnd.random() < 0.7 else '%H%M')),
+                campo_adif('FREQ', f"{rnd.choice(FRECUENCIAS_BANDA[banda][0]) + rnd.randint(0, 2500) / 1e6:.6f}"),
+            ]
+            reporte = '-10' if modo.startswith('FT') else ('599' if modo in ('CW', 'RTTY') else '59')
+            if rnd.random() < 0.9:
+                partes.append(campo_adif('RST_SENT', reporte))
+                partes.append(campo_adif('RST_RCVD', reporte))
+            if rnd.random() < 0.6:
+                partes.append(campo_adif('GRIDSQUARE', generar_locator(rnd)))
+            if rnd.random() < 0.3:
+                partes.append(campo_adif('NAME', rnd.choice(NOMBRES)))
+            if rnd.random() < 0.2:
+                partes.append(campo_adif('QTH', rnd.choice(QTHS)))
+            if rnd.random() < 0.25:
+                partes.append(campo_adif('COMMENT', f"Contacto {i} vía {modo}, 73"))
+            if rnd.random() < 0.4:
+                partes.append(campo_adif('TX_PWR', str(rnd.choice([5, 10, 50, 100, 400]))))
+            partes.append("<EOR>\n")
+            f.write(''.join(partes))
+
+#### PLANES DE CONSULTA ####
+def comprobar_planes():
+    """Retorna el plan (EXPLAIN QUERY PLAN) de cada filtro de FILTROS_INDEXADOS y los que no usan índice"""
+    planes = {}
+    sin_indice = []
+    with funciones.conexion_db() as conn:
+        for nombre, filtro in FILTROS_INDEXADOS.items():
+            sql, params = funciones.consulta_filtrada(filtro)
+            planes[nombre] = [fila[3] for fila in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+            if any(RE_RECORRIDO_COMPLETO.match(paso) for paso in planes[nombre]):
+                sin_indice.append(nombre)
+    return planes, sin_indice
+
+#### MEDICIONES ####
+def medir(funcion, operaciones):
+    """Ejecuta 'funcion' sin salida por pantalla y retorna segundos y operaciones por segundo"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        inicio = time.perf_counter()
+        funcion()
+        segundos = time.perf_counter() - inicio
+    return {
+        'segundos': round(segundos, 6),
+        'operaciones': operaciones,
+        'operaciones_por_segundo': round(operaciones / segundos, 1) if segundos else None
+    }
+
+def ejecutar_benchmark(registros, directorio, semilla):
+    """Mide todas las rutas sobre una base temporal con 'registros' contactos"""
+    ruta_adif = os.path.join(directorio, f"sintetico_{registros}.adi")
+    generar_adif(ruta_adif, registros, semilla)
+
+    funciones.cerrar_conexiones()
+    funciones.DB_NAME = os.path.join(directorio, f"benchmark_{registros}.db")
+    with contextlib.redirect_stdout(io.StringIO()):
+        funciones.preparar_base()
+
+    rnd = random.Random(semilla)
+    etapas = {}
+
+    etapas['importar'] = medir(lambda: funciones.importar_archivo_adif(ruta_adif), registros)
+    etapas['importar']['desglose'] = funciones.obtener_metricas()['etapas']
+
+    with funciones.conexion_db() as conn:
+        total, id_maximo = conn.execute('SELECT COUNT(*), MAX(id) FROM logbook').fetchone()
+    planes, sin_indice = comprobar_planes()
+
+    etapas['exportar_todo'] = medir(
+        lambda: funciones.exportar_consulta(
+            os.path.join(directorio, 'exportacion.adi'), "Benchmark", 'SELECT * FROM logbook'),
+        total
+    )
+    etapas['exportar_todo']['desglose'] = funciones.obtener_metricas()['etapas']
+    # Todo lo importado se creó hoy, así que la exportación del día recorre la base entera
+    etapas['exportar_hoy'] = medir(funciones.exportar_hoy_adif, total)
+
+    def recorrer_listado():
+        pagina = funciones.obtener_pagina_entradas()
+        for _ in range(PAGINAS_LISTADO - 1):
+            if len(pagina) < funciones.TAM_PAGINA:
+                break
+            pagina = funciones.obtener_pagina_entradas(antes=funciones.clave_pagina(pagina[-1]))
+    etapas['listado_primera_pagina'] = medir(funciones.obtener_pagina_entradas, 1)
+    etapas['listado_paginas'] = medir(recorrer_listado, PAGINAS_LISTADO)
+
+    ids = [rnd.randint(1, id_maximo or 1) for _ in range(CONSULTAS_DETALLE)]
+    etapas['detalle_entrada'] = medir(lambda: [funciones.mostrar_detalles_entrada(i) for i in ids], len(ids))
+
+    frecuencias = [rnd.uniform(1.0, 500.0) for _ in range(CONSULTAS_BANDA)]
+    etapas['determinar_banda'] = medir(lambda: [funciones.determinar_banda(f) for f in frecuencias], len(frecuencias))
+    etapas['determinar_bandas_lote'] = medir(lambda: funciones.determinar_bandas(frecuencias), len(frecuencias))
+
+    funciones.cerrar_conexiones()
+    return {
+        'registros': registros,
+        'importados': total,
+        'tamano_base_bytes': os.path.getsize(funciones.DB_NAME),
+        'memoria_maxima_kib': funciones.memoria_maxima_kib(),
+        'etapas': etapas,
+        'planes_consulta': planes,
+        'consultas_sin_indice': sin_indice
+    }
+
+def comparar_resultados(anterior, actual):
+    """Muestra la variación de tiempo de cada etapa respecto a una ejecución anterior"""
+    previos = {r['registros']: r['etapas'] for r in anterior['resultados']}
+    for resultado in actual['resultados']:
+        etapas_previas = previos.get(resultado['registros'])
+        if not etapas_previas:
+            continue
+        print(f"\n{resultado['registros']} registros:", file=sys.stderr)
+        for etapa, medida in resultado['etapas'].items():
+            previa = etapas_previas.get(etapa)
+            if previa and previa['segundos']:
+                cambio = (medida['segundos'] / previa['segundos'] - 1) * 100
+                print(f"  {etapa:<24} {previa['segundos']:>10.4f} s -> {medida['segundos']:>10.4f} s ({cambio:+.1f}%)",
+                      file=sys.stderr)
+
+#### PUNTO DE ENTRADA ####
+def main(argv=None):
+    """Ejecuta el banco de pruebas y escribe los resultados en JSON"""
+    parser = argparse.ArgumentParser(description="Banco de pruebas de rendimiento del logbook")
+    parser.add_argument('--tamanos', type=int, nargs='+', default=TAMANOS_PREDETERMINADOS,
+                        help="Número de registros de cada log sintético (p. ej. 1000 100000 1000000)")
+    parser.add_argument('--semilla', type=int, default=SEMILLA_PREDETERMINADA, help="Semilla del generador")
+    parser.add_argument('-o', '--salida', help="Archivo JSON de resultados (por defecto, salida estándar)")
+    parser.add_argument('--comparar', help="JSON de una ejecución anterior con el que comparar")
+    args = parser.parse_args(argv)
+
+    resultado = {
+        'fecha': datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'plataforma': platform.platform(),
+        'semilla': args.semilla,
+        'resultados': []
+    }
+
+    directorio_original = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='logbook_benchmark_') as directorio:
+        # exportar_hoy_adif escribe en el directorio actual
+        os.chdir(directorio)
+        try:
+            for registros in args.tamanos:
+                print(f"Midiendo con {registros} registros...", file=sys.stderr)
+                resultado['resultados'].append(ejecutar_benchmark(registros, directorio, args.semilla))
+        finally:
+            os.chdir(directorio_original)
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar_resultados(json.load(f), resultado)
+    
+    sin_indice = sorted({nombre for r in resultado['resultados'] for nombre in r['consultas_sin_indice']})
+    if sin_indice:
+        print(f"[ERROR] Filtros que recorren logbook entero: {', '.join(sin_indice)}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
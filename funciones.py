@@ -1,9 +1,22 @@
 #### IMPORTAR MÓDULOS ####
 import sqlite3
+import calendar
+import contextlib
 import datetime
+import glob
+import mmap
 from datetime import timezone
 import os
 import re
+import struct
+import sys
+from bisect import bisect_right
+import threading
+import time
+from collections import namedtuple
+from itertools import islice
+
+import geometria
 
 #### DEFINICIÓN DE COLORES ####
 MAGENTA = "\033[35m"
@@ -13,26 +26,300 @@ RESET = "\033[0m"
 
 #### CONSTANTES ####
 DB_NAME = 'hamradio_logbook.db'
+TAM_BLOQUE_ADIF = 1024 * 1024  # Bytes leídos por bloque al importar ADIF comprimido o desde la entrada estándar
+ENTRADA_ESTANDAR = '-'  # Nombre de archivo que importa desde la entrada estándar
+EXTENSIONES_ADIF = ('.adi', '.adif')  # Miembros de un .zip que se importan
+TAM_LOTE_IMPORTACION = 1000  # Registros por executemany al importar ADIF
+LOTES_EN_COLA_IMPORTACION = 4  # Lotes que cada proceso de análisis puede adelantar al escritor
+TIMEOUT_DB = 10  # Segundos de espera si la base de datos está bloqueada
+TAM_PAGINA = 20  # Entradas por página en el listado
+TAM_TRAMO_INDEXADO = 50000  # Filas por transacción al construir índices sobre datos existentes
+TAM_LOTE_EXPORTACION = 2000  # Filas leídas por fetchmany al exportar
+TAM_BUFFER_ESCRITURA = 1024 * 1024  # Bytes de buffer del archivo exportado
+COMPRESIONES = {'gz': '.gz', 'bz2': '.bz2', 'xz': '.xz'}  # Compresiones de exportación y su extensión
+NIVEL_GZIP = 6  # Compromiso entre velocidad y tamaño al exportar comprimido con gzip
+SENTENCIAS_CACHEADAS = 256  # Tamaño de la caché de sentencias preparadas por conexión
+VISTA_HISTORIAL = 'logbook_completo'  # Vista TEMP del logbook y sus archivos anuales (ver adjuntar_archivos)
+LIMITE_ADJUNTOS = 10  # SQLITE_MAX_ATTACHED predeterminado, si la conexión no permite consultarlo
+PUERTO_WSJTX = 2237  # Puerto UDP predeterminado de WSJT-X
+PUERTO_N1MM = 12060  # Puerto UDP predeterminado de N1MM Logger+
+HOST_UDP = '127.0.0.1'  # Solo local: WSJT-X y N1MM envían a 127.0.0.1 por defecto
+TAM_COLA_UDP = 10000  # Contactos en espera de escritura; si se llena se descartan datagramas
+TAM_LOTE_UDP = 500  # Contactos máximos por transacción en el servicio UDP
+INTERVALO_LOTE_UDP = 2.0  # Segundos máximos que un contacto recibido espera a escribirse
+TAM_BUFFER_UDP = 4 * 1024 * 1024  # Bytes de buffer del socket para absorber ráfagas de datagramas
+PRAGMAS_DB = [
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -65536',  # 64 MiB de caché de páginas
+    'PRAGMA mmap_size = 268435456',  # 256 MiB mapeados en memoria
+    'PRAGMA temp_store = MEMORY',
+    f'PRAGMA busy_timeout = {TIMEOUT_DB * 1000}'
+]
+RE_TAG_ADIF = re.compile(rb'<([^:<>]*)(?::([^:<>]*))?[^<>]*>')  # <TAG>, <TAG:LONGITUD> o <TAG:LONGITUD:TIPO>
+# Campos que usa la importación; el tokenizador de bytes no decodifica el resto
+CAMPOS_ADIF_IMPORTADOS = frozenset([
+    b'CALL', b'BAND', b'MODE', b'QSO_DATE', b'TIME_ON', b'FREQ', b'RST_SENT', b'RST_RCVD',
+    b'COMMENT', b'QSLMSG', b'QSLMSG_INTL', b'QTH', b'NAME', b'GRIDSQUARE', b'TX_PWR'
+])
+RE_NUMERO = re.compile(r'^\d+(\.\d+)?$')
+# Un prefijo con '*' final (K*, DL*, EA8*) o un indicativo completo, que lleva letras y cifras
+RE_INDICATIVO_BUSQUEDA = re.compile(r'^(?:[A-Za-z0-9/]+\*|(?=[^ ]*[0-9])(?=[^ ]*[A-Za-z])[A-Za-z0-9/]+)$')
+
+#### PLANES DE BANDA ####
+# Intervalos (inicio, fin, banda) en MHz por región IARU; los extremos se incluyen
+BANDAS_COMUNES = [
+    (5.3515, 5.3665, '60m'),
+    (10.1, 10.15, '30m'),
+    (14.0, 14.35, '20m'),
+    (18.068, 18.168, '17m'),
+    (21.0, 21.45, '15m'),
+    (24.89, 24.99, '12m'),
+    (28.0, 29.7, '10m'),
+    (1240.0, 1300.0, '23cm'),
+    (2300.0, 2450.0, '13cm'),
+    (10000.0, 10500.0, '3cm'),
+    (24000.0, 24250.0, '1,2cm'),
+    (47000.0, 47200.0, '6mm'),
+]
+PLANES_BANDA = {
+    '1': BANDAS_COMUNES + [
+        (1.81, 2.0, '160m'),
+        (3.5, 3.8, '80m'),
+        (7.0, 7.2, '40m'),
+        (50.0, 52.0, '6m'),
+        (70.0, 70.5, '4m'),
+        (144.0, 146.0, '2m'),
+        (430.0, 440.0, '70cm'),
+        (3400.0, 3475.0, '9cm'),
+        (5650.0, 5850.0, '5cm'),
+    ],
+    '2': BANDAS_COMUNES + [
+        (1.8, 2.0, '160m'),
+        (3.5, 4.0, '80m'),
+        (7.0, 7.3, '40m'),
+        (50.0, 54.0, '6m'),
+        (144.0, 148.0, '2m'),
+        (220.0, 225.0, '1,2m'),
+        (420.0, 450.0, '70cm'),
+        (902.0, 928.0, '33cm'),
+        (3300.0, 3500.0, '9cm'),
+        (5650.0, 5925.0, '5cm'),
+    ],
+    '3': BANDAS_COMUNES + [
+        (1.8, 2.0, '160m'),
+        (3.5, 3.9, '80m'),
+        (7.0, 7.2, '40m'),
+        (50.0, 54.0, '6m'),
+        (144.0, 148.0, '2m'),
+        (430.0, 440.0, '70cm'),
+        (3300.0, 3500.0, '9cm'),
+        (5650.0, 5850.0, '5cm'),
+    ],
+}
+REGION_IARU_PREDETERMINADA = '2'
+_plan_activo = {}  # Tabla de búsqueda del plan en uso, ver cargar_plan_bandas()
 
 #### FUNCIONES DE INICIO ####
 def iniciar_aplicacion():
     """Punto de entrada principal de la aplicación"""
-    crear_base()
+    preparar_base()
     mostrar_menu_principal()
 
+def preparar_base():
+    """Crea o actualiza la base de datos y activa el plan de bandas configurado"""
+    crear_base()
+    indexar_busqueda_pendiente()
+    calcular_epoch_pendiente()
+    calcular_geometria_pendiente()
+    cargar_plan_bandas(cargar_configuracion()['iaru_region'])
+
+#### LÍNEA DE COMANDOS ####
+def ejecutar_comando(argv):
+    """Ejecuta un subcomando sin interacción y retorna el código de salida"""
+    # argparse solo se carga cuando hay subcomando; el menú interactivo no lo necesita
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog='logbook.py', description="Epelbyte HamRadio Logbook")
+    parser.add_argument('--profile', metavar='FILE', help="Perfila la ejecución con cProfile y guarda las estadísticas en FILE")
+    parser.add_argument('--metrics', metavar='FILE', help="Guarda en JSON los tiempos por etapa y la memoria máxima")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    
+    p_importar = subparsers.add_parser('import', help="Importa uno o más archivos ADIF (también .gz, .bz2, .xz y .zip)")
+    p_importar.add_argument('archivos', nargs='+', metavar='FILE', help=f"Archivo ADIF; '{ENTRADA_ESTANDAR}' lee la entrada estándar")
+    p_importar.add_argument('-j', '--jobs', type=int, help="Procesos de análisis para varios archivos (por defecto, uno por núcleo)")
+    
+    p_exportar = subparsers.add_parser('export', help="Exporta contactos a ADIF, ADX, Cabrillo, CSV o JSON Lines")
+    p_exportar.add_argument('-o', '--output', help="Archivo de salida (la compresión se deduce también de su extensión)")
+    p_exportar.add_argument('-f', '--format', choices=list(FORMATOS_EXPORTACION), default='adif', help="Formato de salida")
+    p_exportar.add_argument('--compress', choices=list(COMPRESIONES), help="Comprime la salida al escribirla")
+    p_exportar.add_argument('--incremental', metavar='DESTINO', help="Exporta solo lo añadido desde la última exportación a DESTINO")
+    agregar_argumentos_filtro(p_exportar)
+    
+    p_listar = subparsers.add_parser('list', help="Lista los contactos más recientes")
+    p_listar.add_argument('--limit', type=int, default=TAM_PAGINA, help="Número de contactos")
+    agregar_argumentos_filtro(p_listar)
+    
+    p_buscar = subparsers.add_parser('search', help="Busca contactos por indicativo (EA8* para prefijo) o texto")
+    p_buscar.add_argument('texto')
+    p_buscar.add_argument('--limit', type=int, default=TAM_PAGINA, help="Número de contactos")
+    
+    p_estadisticas = subparsers.add_parser('stats', help="Muestra estadísticas del logbook")
+    p_estadisticas.add_argument('--rebuild', action='store_true', help="Reconstruye antes las tablas de resumen")
+    
+    p_archivar = subparsers.add_parser('archive', help="Mueve los años cerrados a archivos anuales adjuntos")
+    p_archivar.add_argument('--until', type=int, metavar='AÑO', help="Último año a archivar (por defecto, el anterior al actual)")
+    
+    p_servir = subparsers.add_parser('serve', help="Recibe por UDP los contactos registrados en WSJT-X o N1MM")
+    p_servir.add_argument('--port', type=int, action='append', dest='puertos', metavar='PUERTO',
+                          help=f"Puerto UDP; se puede repetir (por defecto, {PUERTO_WSJTX} y {PUERTO_N1MM})")
+    p_servir.add_argument('--host', default=HOST_UDP,
+                          help=f"Dirección en la que escuchar (por defecto, {HOST_UDP}; 0.0.0.0 para todas las interfaces)")
+    p_servir.add_argument('--capture', metavar='FILE', help="Guarda los datagramas recibidos para reproducirlos después")
+    p_servir.add_argument('--duration', type=float, metavar='SEGUNDOS', help="Segundos de escucha (por defecto, hasta Ctrl+C)")
+    
+    args = parser.parse_args(argv)
+    if args.comando in ('export', 'list'):
+        args.filtro = filtro_de_argumentos(args)
+        # La marca incremental avanza sobre todo el rango de IDs: lo filtrado no se exportaría nunca
+        if args.comando == 'export' and args.incremental and args.filtro:
+            parser.error("--incremental no admite filtros")
+    if args.comando == 'archive' and args.until is not None and args.until >= datetime.datetime.now(timezone.utc).year:
+        parser.error("--until debe ser un año cerrado")
+    
+    if args.profile:
+        import cProfile
+        import pstats
+        
+        perfil = cProfile.Profile()
+        codigo = perfil.runcall(ejecutar_subcomando, args)
+        perfil.dump_stats(args.profile)
+        print(f"\nPerfil guardado en {args.profile}; funciones con más tiempo acumulado:", file=sys.stderr)
+        pstats.Stats(perfil, stream=sys.stderr).sort_stats('cumulative').print_stats(20)
+    else:
+        codigo = ejecutar_subcomando(args)
+    
+    if args.metrics:
+        import json
+        
+        with open(args.metrics, 'w', encoding='utf-8') as f:
+            json.dump(obtener_metricas(), f, indent=2, ensure_ascii=False)
+    return codigo
+
+def ejecutar_subcomando(args):
+    """Ejecuta el subcomando ya analizado y retorna el código de salida"""
+    try:
+        preparar_base()
+        if args.comando == 'import':
+            # La entrada estándar solo la puede leer este proceso, no los procesos auxiliares
+            if len(args.archivos) > 1 and ENTRADA_ESTANDAR not in args.archivos:
+                resultados = importar_archivos_adif(args.archivos, args.jobs)
+            else:
+                resultados = [importar_archivo_adif(filename) for filename in args.archivos]
+            return 0 if all(r is not None for r in resultados) else 1
+        elif args.comando == 'export':
+            if args.incremental:
+                exportar_incremental(args.incremental, args.output, args.format, args.compress)
+            else:
+                salida = args.output or nombre_exportacion('hamradio_logbook', args.format, args.compress)
+                total = exportar_filtrado(salida, args.filtro, args.format, args.compress)
+                print(f"Se exportaron {total} entradas a {salida}")
+                imprimir_metricas()
+        elif args.comando == 'list':
+            pagina = obtener_pagina_entradas(limite=args.limit, filtro=args.filtro)
+            if pagina:
+                imprimir_pagina_entradas(pagina)
+            else:
+                print("No hay entradas en el logbook.")
+        elif args.comando == 'search':
+            pagina, _ = buscar_contactos(args.texto, limite=args.limit)
+            if pagina:
+                imprimir_pagina_entradas(pagina)
+            else:
+                print("No se encontraron contactos.")
+        elif args.comando == 'stats':
+            if args.rebuild:
+                recalcular_estadisticas()
+            mostrar_estadisticas()
+        elif args.comando == 'archive':
+            archivar_anios(args.until)
+        elif args.comando == 'serve':
+            servir_udp(args.puertos or [PUERTO_WSJTX, PUERTO_N1MM], args.capture, args.duration, args.host)
+        return 0
+    except (sqlite3.Error, OSError) as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 1
+    finally:
+        cerrar_conexiones()
+
+def fecha_limite_argumento(texto):
+    """Convierte 'AAAA-MM-DD [HH:MM[:SS]]' en (timestamp, es_solo_fecha) para argparse"""
+    try:
+        return analizar_fecha_limite(texto)
+    except ValueError as e:
+        import argparse
+        raise argparse.ArgumentTypeError(str(e))
+
+def indicativo_argumento(texto):
+    """Valida para argparse un indicativo exacto o un prefijo con '*' final"""
+    try:
+        rango_indicativo(texto)
+    except ValueError as e:
+        import argparse
+        raise argparse.ArgumentTypeError(str(e))
+    return texto
+
+def analizar_fecha_limite(texto):
+    """Convierte 'AAAA-MM-DD [HH:MM[:SS]]' (o con 'T' entre fecha y hora) en (timestamp, es_solo_fecha)"""
+    for formato in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            dt = datetime.datetime.strptime(texto.strip().replace('T', ' '), formato)
+            return dt, formato == '%Y-%m-%d'
+        except ValueError:
+            continue
+    raise ValueError(f"fecha no válida: {texto!r} (usa AAAA-MM-DD [HH:MM[:SS]])")
+
+def agregar_argumentos_filtro(parser):
+    """Añade a un subcomando las opciones que construyen el filtro de contactos"""
+    parser.add_argument('--call', type=indicativo_argumento,
+                        help="Indicativo exacto, o prefijo con '*' final (p. ej. 'EA8*')")
+    parser.add_argument('--band', action='append', dest='bandas', metavar='BANDA', help="Banda; se puede repetir")
+    parser.add_argument('--mode', action='append', dest='modos', metavar='MODO', help="Modo; se puede repetir")
+    parser.add_argument('--since', type=fecha_limite_argumento, help="Desde (UTC) AAAA-MM-DD [HH:MM[:SS]], incluida")
+    parser.add_argument('--until', type=fecha_limite_argumento, help="Hasta (UTC) AAAA-MM-DD [HH:MM[:SS]], incluida")
+    parser.add_argument('--has-grid', action='store_true', help="Solo contactos con locator")
+    parser.add_argument('--min-distance', type=float, metavar='KM', help="Distancia mínima en km")
+
+def filtro_de_argumentos(args):
+    """Construye el filtro de contactos a partir de las opciones de agregar_argumentos_filtro()"""
+    filtro = {
+        'indicativo': args.call,
+        'bandas': args.bandas,
+        'modos': args.modos,
+        'con_locator': True if args.has_grid else None,
+        'distancia_minima': args.min_distance
+    }
+    filtro.update(limites_timestamp(args.since, args.until))
+    return {clave: valor for clave, valor in filtro.items() if valor is not None}
+
 #### FUNCIONES DEL MENÚ ####
+OPCION_SALIR = 7  # Fija desde la primera versión: las sesiones guionizadas salen con 7
+
 def mostrar_menu_principal():
     """Muestra el menú principal y maneja las opciones"""
     opcion = 0
-    while opcion != 7:
-        imprimir_menu()
-        
-        try:
-            opcion = int(input("\nSelecciona una opción: "))
-        except ValueError:
-            opcion = 0
+    try:
+        while opcion != OPCION_SALIR:
+            imprimir_menu()
+            
+            try:
+                opcion = int(input("\nSelecciona una opción: "))
+            except ValueError:
+                opcion = 0
 
-        manejar_opcion(opcion)
+            manejar_opcion(opcion)
+    finally:
+        cerrar_conexiones()
 
     print("\n¡Hasta luego! 73")
 
@@ -45,10 +332,16 @@ def imprimir_menu():
     print(f"{MAGENTA}1. Agregar contacto")
     print("2. Listar contactos")
     print("3. Importar desde ADIF")
-    print("4. Exportar todo hacia ADIF")
+    print("4. Exportar todo (ADIF, ADX, Cabrillo, CSV o JSONL)")
     print("5. Exportar entradas de hoy a ADIF")  # Nueva opción
     print("6. Configurar estación")
-    print(f"7. Salir{RESET}")
+    # Las opciones nuevas van detrás de la de salir para no cambiar los números existentes
+    print("8. Buscar contactos")
+    print("9. Exportar entradas nuevas a ADIF (incremental)")
+    print("10. Estadísticas")
+    print(f"11. Modo concurso ({'activo' if _estado_concurso['activo'] else 'inactivo'})")
+    print("12. Archivar años cerrados")
+    print(f"{OPCION_SALIR}. Salir{RESET}")
 
 def manejar_opcion(opcion):
     """Dirige a la función correspondiente según la opción seleccionada"""
@@ -58,13 +351,18 @@ def manejar_opcion(opcion):
         3: importar_adif,
         4: exportar_adif,
         5: exportar_hoy_adif,
-        6: configurar_estacion
-        # La opción 7 es para salir y no necesita acción
+        6: configurar_estacion,
+        8: buscar_entradas,
+        9: exportar_nuevas_adif,
+        10: menu_estadisticas,
+        11: alternar_modo_concurso,
+        12: archivar_entradas
+        # La opción OPCION_SALIR es para salir y no necesita acción
     }
     
     if opcion in acciones:
         acciones[opcion]()
-    elif opcion != 7:  # Solo muestra error si no es 7 (salir)
+    elif opcion != OPCION_SALIR:  # Solo muestra error si no es salir
         print("\nOpción incorrecta, por favor intente nuevamente\n")
 
 #### FUNCIONES DE BASE DE DATOS ####
@@ -105,51 +403,802 @@ def crear_base():
                 updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        
+        migrar_base(conn)
+        adjuntar_archivos(conn)
+
+# Una conexión por hilo que vive hasta cerrar_conexiones(); sqlite3 guarda en
+# cada conexión una caché de sentencias preparadas indexada por el texto SQL.
+_conexiones = {}
+_cerrojo_conexiones = threading.Lock()
 
 def conexion_db():
-    """Crea y retorna una conexión a la base de datos"""
-    return sqlite3.connect(DB_NAME)
+    """Retorna la conexión del hilo actual, abriéndola y ajustándola la primera vez"""
+    hilo = threading.get_ident()
+    conn = _conexiones.get(hilo)
+    if conn is None:
+        conn = sqlite3.connect(
+            DB_NAME,
+            timeout=TIMEOUT_DB,
+            cached_statements=SENTENCIAS_CACHEADAS,
+            check_same_thread=False  # Solo para poder cerrarla desde cerrar_conexiones()
+        )
+        for pragma in PRAGMAS_DB:
+            conn.execute(pragma)
+        adjuntar_archivos(conn)
+        with _cerrojo_conexiones:
+            _conexiones[hilo] = conn
+    return conn
 
-#### FUNCIONES DE CONFIGURACIÓN ####
-def cargar_configuracion():
-    """Carga la configuración de la estación desde la base de datos"""
+def cerrar_conexiones():
+    """Cierra todas las conexiones abiertas a la base de datos"""
+    with _cerrojo_conexiones:
+        for conn in _conexiones.values():
+            try:
+                conn.execute('PRAGMA optimize')
+            except sqlite3.Error:
+                pass
+            conn.close()
+        _conexiones.clear()
+    # La configuración en caché pertenece a la base que se acaba de cerrar
+    _configuracion.clear()
+
+#### ARCHIVOS ANUALES ####
+# Los años cerrados se mueven a un archivo SQLite por año que cada conexión adjunta
+# con ATTACH; la base principal guarda solo el año en curso y lo no archivado.
+# Índices de cada archivo anual: los del listado, las búsquedas, los duplicados, el ODX y
+# la exportación de lo creado en un día
+INDICES_ARCHIVO = [
+    'CREATE INDEX IF NOT EXISTS idx_logbook_ts_epoch ON logbook (ts_epoch)',
+    'CREATE INDEX IF NOT EXISTS idx_logbook_call_ts_epoch ON logbook (contact_call, ts_epoch)',
+    'CREATE INDEX IF NOT EXISTS idx_logbook_banda_distancia ON logbook (band, distance_km)',
+    'CREATE INDEX IF NOT EXISTS idx_logbook_created_at ON logbook (created_at)'
+]
+_archivos_no_encontrados = set()  # Para avisar una sola vez aunque se abran varias conexiones
+
+def adjuntar_archivos(conn):
+    """Adjunta a la conexión los archivos anuales registrados y crea la vista VISTA_HISTORIAL
+    
+    La vista une con UNION ALL el logbook y la tabla de cada archivo, columna a columna
+    (las que le falten a un archivo antiguo salen como NULL). Un archivo que no se
+    encuentra se omite con un aviso. Se puede llamar de nuevo tras archivar un año.
+    """
+    cursor = conn.cursor()
+    if not tabla_existe(cursor, 'logbook'):
+        return
+    columnas = [fila[1] for fila in cursor.execute('PRAGMA main.table_info(logbook)').fetchall()]
+    
+    # Esquema 'archivo_<primer año>' -> ruta de cada archivo registrado
+    deseados = {}
+    if tabla_existe(cursor, 'logbook_archivo'):
+        cursor.execute('SELECT archivo, MIN(anio) FROM logbook_archivo GROUP BY archivo ORDER BY MIN(anio)')
+        for archivo, anio in cursor.fetchall():
+            ruta = ruta_archivo_anual(archivo)
+            if os.path.exists(ruta):
+                deseados[f'archivo_{anio}'] = os.path.realpath(ruta)
+            elif ruta not in _archivos_no_encontrados:
+                _archivos_no_encontrados.add(ruta)
+                print(f"[WARN] No se encuentra el archivo anual {ruta}; sus contactos no se incluyen")
+    
+    cursor.execute(f'DROP VIEW IF EXISTS temp.{VISTA_HISTORIAL}')
+    adjuntos = {nombre: ruta for _, nombre, ruta in cursor.execute('PRAGMA database_list').fetchall()
+                if nombre.startswith('archivo_')}
+    for nombre, ruta in adjuntos.items():
+        if deseados.get(nombre) != ruta:
+            cursor.execute(f'DETACH DATABASE {nombre}')
+    for nombre, ruta in deseados.items():
+        if adjuntos.get(nombre) != ruta:
+            cursor.execute(f'ATTACH DATABASE ? AS {nombre}', (ruta,))
+            # Un archivo creado por una versión anterior recibe los índices que le falten
+            for sql in INDICES_ARCHIVO:
+                cursor.execute(sql.replace('IF NOT EXISTS ', f'IF NOT EXISTS {nombre}.', 1))
+    
+    partes = [f"SELECT {', '.join(columnas)} FROM main.logbook"]
+    for nombre in deseados:
+        existentes = {fila[1] for fila in cursor.execute(f'PRAGMA {nombre}.table_info(logbook)').fetchall()}
+        seleccion = ', '.join(c if c in existentes else f'NULL AS {c}' for c in columnas)
+        partes.append(f'SELECT {seleccion} FROM {nombre}.logbook')
+    # TEMP porque una vista de la base principal no puede leer de otras bases adjuntas
+    cursor.execute(f"CREATE TEMP VIEW {VISTA_HISTORIAL} AS {' UNION ALL '.join(partes)}")
+
+def separar_archivos(conn):
+    """Quita de la conexión la vista VISTA_HISTORIAL y los archivos anuales adjuntos"""
+    conn.execute(f'DROP VIEW IF EXISTS temp.{VISTA_HISTORIAL}')
+    for _, nombre, _ in conn.execute('PRAGMA database_list').fetchall():
+        if nombre.startswith('archivo_'):
+            conn.execute(f'DETACH DATABASE {nombre}')
+
+def ruta_archivo_anual(archivo):
+    """Retorna la ruta de un archivo anual, que se guarda junto a la base principal"""
+    return os.path.join(os.path.dirname(DB_NAME), archivo)
+
+def limite_adjuntos(conn):
+    """Retorna cuántas bases se pueden adjuntar a la conexión"""
+    # Connection.getlimit() existe desde Python 3.11
+    if hasattr(conn, 'getlimit'):
+        return conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    return LIMITE_ADJUNTOS
+
+def archivo_para_anio(cursor, anio, limite):
+    """Elige el archivo de un año: el ya registrado, uno nuevo o, si no cabe otro adjunto, el del año archivado más próximo"""
+    cursor.execute('SELECT archivo FROM logbook_archivo WHERE anio = ?', (anio,))
+    fila = cursor.fetchone()
+    if fila:
+        return fila[0]
+    cursor.execute('SELECT COUNT(DISTINCT archivo) FROM logbook_archivo')
+    if cursor.fetchone()[0] < limite:
+        return f"{os.path.splitext(os.path.basename(DB_NAME))[0]}_{anio}.db"
+    cursor.execute('SELECT archivo FROM logbook_archivo ORDER BY ABS(anio - ?), anio LIMIT 1', (anio,))
+    return cursor.fetchone()[0]
+
+def crear_archivo_anual(conn, ruta):
+    """Crea en 'ruta' la tabla logbook de un archivo anual, o le añade las columnas que le falten"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'logbook'")
+    sql_tabla = cursor.fetchone()[0]
+    columnas = cursor.execute('PRAGMA main.table_info(logbook)').fetchall()
+    
+    with contextlib.closing(sqlite3.connect(ruta, timeout=TIMEOUT_DB)) as archivo:
+        with archivo:
+            archivo.execute(sql_tabla.replace('CREATE TABLE', 'CREATE TABLE IF NOT EXISTS', 1))
+            existentes = {fila[1] for fila in archivo.execute('PRAGMA table_info(logbook)').fetchall()}
+            for _, nombre, tipo, *_ in columnas:
+                if nombre not in existentes:
+                    archivo.execute(f'ALTER TABLE logbook ADD COLUMN {nombre} {tipo}')
+            for sql in INDICES_ARCHIVO:
+                archivo.execute(sql)
+
+def archivar_anio(anio):
+    """Mueve los contactos de un año cerrado a su archivo anual; retorna (contactos movidos, archivo)
+    
+    Con la base principal en modo WAL una transacción no es atómica entre dos archivos:
+    el año se registra antes de copiar y la copia ignora los id que ya estén en el
+    archivo, así que si se interrumpe basta con volver a archivar el año.
+    """
+    if anio >= datetime.datetime.now(timezone.utc).year:
+        raise ValueError(f"El año {anio} no está cerrado")
+    rango = (calendar.timegm((anio, 1, 1, 0, 0, 0)), calendar.timegm((anio + 1, 1, 1, 0, 0, 0)))
+    
+    conn = conexion_db()
+    cursor = conn.cursor()
+    with conn:
+        archivo = archivo_para_anio(cursor, anio, limite_adjuntos(conn))
+        crear_archivo_anual(conn, ruta_archivo_anual(archivo))
+        cursor.execute('INSERT OR IGNORE INTO logbook_archivo (anio, archivo, qsos) VALUES (?, ?, 0)', (anio, archivo))
+    # ATTACH no se admite dentro de una transacción: el registro ya está confirmado
+    adjuntar_archivos(conn)
+    cursor.execute('SELECT MIN(anio) FROM logbook_archivo WHERE archivo = ?', (archivo,))
+    esquema = f'archivo_{cursor.fetchone()[0]}'
+    columnas = ', '.join(fila[1] for fila in cursor.execute('PRAGMA main.table_info(logbook)').fetchall())
+    
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO {esquema}.logbook ({columnas})
+            SELECT {columnas} FROM main.logbook WHERE ts_epoch >= ? AND ts_epoch < ?
+        ''', rango)
+        cursor.execute("INSERT OR REPLACE INTO logbook_meta (clave, valor) VALUES ('archivando', ?)", (anio,))
+        cursor.execute('DELETE FROM main.logbook WHERE ts_epoch >= ? AND ts_epoch < ?', rango)
+        movidos = cursor.rowcount
+        cursor.execute("DELETE FROM logbook_meta WHERE clave = 'archivando'")
+        cursor.execute(f'''
+            UPDATE logbook_archivo SET updated_at = CURRENT_TIMESTAMP,
+                qsos = (SELECT COUNT(*) FROM {esquema}.logbook WHERE ts_epoch >= ? AND ts_epoch < ?)
+            WHERE anio = ?
+        ''', (*rango, anio))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return movidos, archivo
+
+def anios_archivables(hasta_anio):
+    """Retorna los años hasta 'hasta_anio' (incluido) que aún tienen contactos en el logbook"""
+    limite = calendar.timegm((hasta_anio + 1, 1, 1, 0, 0, 0))
+    anios = []
+    desde = -2 ** 63
     with conexion_db() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM station_config ORDER BY id DESC LIMIT 1')
-        config = cursor.fetchone()
-    
-    return {
-        'my_call': config[1] if config else '',
-        'power': config[2] if config else '',
-        'location': config[3] if config else '',
-        'grid_locator': config[4] if config else '',
-        'antenna': config[5] if config else '',
-        'equipment': config[6] if config else ''
-    } if config else {
-        'my_call': '',
-        'power': '',
-        'location': '',
-        'grid_locator': '',
-        'antenna': '',
-        'equipment': ''
-    }
+        while True:
+            # Un salto por año con contactos: cada consulta es una búsqueda en idx_logbook_ts_epoch
+            cursor.execute('SELECT MIN(ts_epoch) FROM logbook WHERE ts_epoch >= ? AND ts_epoch < ?', (desde, limite))
+            primero = cursor.fetchone()[0]
+            if primero is None:
+                return anios
+            anio = time.gmtime(primero).tm_year
+            anios.append(anio)
+            desde = calendar.timegm((anio + 1, 1, 1, 0, 0, 0))
+
+def archivar_anios(hasta_anio=None):
+    """Archiva los años cerrados hasta 'hasta_anio' (por defecto, el anterior al actual); retorna los contactos movidos"""
+    if hasta_anio is None:
+        hasta_anio = datetime.datetime.now(timezone.utc).year - 1
+    anios = anios_archivables(hasta_anio)
+    if not anios:
+        print("No hay años cerrados con contactos que archivar.")
+        return 0
+    
+    inicio = time.perf_counter()
+    total = 0
+    for anio in anios:
+        movidos, archivo = archivar_anio(anio)
+        total += movidos
+        print(f"[INFO] {anio}: {movidos} contactos movidos a {archivo}")
+    # Las páginas liberadas se reutilizarían igualmente; VACUUM devuelve el espacio al disco.
+    # VACUUM adjunta internamente una base temporal, que no cabría con todos los archivos adjuntos
+    conn = conexion_db()
+    separar_archivos(conn)
+    conn.execute('VACUUM main')
+    adjuntar_archivos(conn)
+    print(f"[INFO] {total} contactos archivados en {time.perf_counter() - inicio:.2f} s")
+    return total
+
+def archivar_entradas():
+    """Pide hasta qué año archivar y mueve los años cerrados a sus archivos anuales"""
+    print("\n--- Archivar años cerrados ---")
+    anterior = datetime.datetime.now(timezone.utc).year - 1
+    texto = input(f"Archivar hasta el año (incluido) [{anterior}]: ").strip()
+    try:
+        hasta_anio = int(texto) if texto else anterior
+    except ValueError:
+        print("Año no válido.")
+        return
+    if hasta_anio > anterior:
+        print(f"{RED}Solo se pueden archivar años cerrados (hasta {anterior}).{RESET}")
+        return
+    archivar_anios(hasta_anio)
+
+#### INSTRUMENTACIÓN ####
+_metricas = {}  # Etapa -> segundos, llamadas y registros acumulados desde reiniciar_metricas()
+
+def reiniciar_metricas():
+    """Descarta las métricas acumuladas"""
+    _metricas.clear()
+
+def sumar_metrica(etapa, segundos, registros=0, llamadas=1):
+    """Acumula tiempo, llamadas y registros procesados en una etapa"""
+    metrica = _metricas.setdefault(etapa, {'segundos': 0.0, 'llamadas': 0, 'registros': 0})
+    metrica['segundos'] += segundos
+    metrica['llamadas'] += llamadas
+    metrica['registros'] += registros
+
+@contextlib.contextmanager
+def medir_etapa(etapa, registros=0):
+    """Mide el bloque 'with' como una llamada a la etapa"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        sumar_metrica(etapa, time.perf_counter() - inicio, registros)
+
+def memoria_maxima_kib():
+    """Retorna la memoria residente máxima del proceso en KiB, o None si el sistema no la ofrece"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxima = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS la da en bytes; Linux y los BSD, en KiB
+    return maxima // 1024 if sys.platform == 'darwin' else maxima
+
+def obtener_metricas():
+    """Retorna las métricas de cada etapa, con registros por segundo, y la memoria máxima"""
+    etapas = {}
+    for etapa, metrica in _metricas.items():
+        etapas[etapa] = {
+            'segundos': round(metrica['segundos'], 6),
+            'llamadas': metrica['llamadas'],
+            'registros': metrica['registros'],
+            'registros_por_segundo': round(metrica['registros'] / metrica['segundos'], 1) if metrica['segundos'] else None
+        }
+    return {'etapas': etapas, 'memoria_maxima_kib': memoria_maxima_kib()}
+
+def incorporar_metricas(metricas):
+    """Suma las métricas obtenidas en otro proceso"""
+    for etapa, metrica in metricas['etapas'].items():
+        sumar_metrica(etapa, metrica['segundos'], metrica['registros'], metrica['llamadas'])
+
+def imprimir_metricas():
+    """Muestra el tiempo de cada etapa y la memoria máxima del proceso"""
+    metricas = obtener_metricas()
+    print("\nTiempos por etapa:")
+    for etapa, metrica in metricas['etapas'].items():
+        ritmo = f", {metrica['registros_por_segundo']:.0f} registros/s" if metrica['registros_por_segundo'] else ""
+        print(f"- {etapa}: {metrica['segundos']:.3f} s ({metrica['registros']} registros{ritmo})")
+    if metricas['memoria_maxima_kib'] is not None:
+        print(f"- Memoria máxima del proceso: {metricas['memoria_maxima_kib'] / 1024:.1f} MiB")
+
+#### SENTENCIAS SQL ####
+# Texto fijo para reutilizar la sentencia preparada de la caché de la conexión
+# Contacto listo para insertar: los campos siguen el orden de las columnas de SQL_INSERTAR_QSO,
+# así que una secuencia de QSO se pasa tal cual a executemany
+CAMPOS_QSO = ('my_call', 'contact_call', 'frequency', 'band', 'mode', 'timestamp',
+              'rst_sent', 'rst_received', 'comment', 'qth', 'name', 'grid_locator', 'power',
+              'ts_epoch', 'distance_km', 'bearing')
+# Distancia y rumbo se completan por lotes al insertar (completar_geometria)
+QSO = namedtuple('QSO', CAMPOS_QSO, defaults=(None, None))
+SQL_INSERTAR_QSO = f'''
+    INSERT INTO logbook ({', '.join(CAMPOS_QSO)})
+    VALUES ({', '.join('?' * len(CAMPOS_QSO))})
+'''
+# Columnas de cada fila del listado y de los resultados de búsqueda (ver imprimir_pagina_entradas)
+COLUMNAS_LISTADO = 'id, ts_epoch, my_call, contact_call, frequency, band, mode, comment, distance_km, bearing'
+# Claves de un lote en importación que ya están en el historial; con EXISTS, cada una se busca
+# en idx_logbook_call_ts_epoch de la base principal y de cada archivo anual
+SQL_CLAVES_REGISTRADAS = f'''
+    SELECT k.contact_call, k.ts_epoch FROM temp.claves_importacion k
+    WHERE EXISTS (
+        SELECT 1 FROM {VISTA_HISTORIAL} l
+        WHERE l.contact_call = k.contact_call AND l.ts_epoch = k.ts_epoch
+    )
+'''
+
+#### MIGRACIONES DE ESQUEMA ####
+def migrar_configuracion_unica(cursor):
+    """Pasa las versiones de station_config al historial y deja solo la activa con id 1"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS station_config_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            my_call TEXT,
+            power TEXT,
+            location TEXT,
+            grid_locator TEXT,
+            antenna TEXT,
+            equipment TEXT,
+            iaru_region TEXT,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    campos = ", ".join(CAMPOS_CONFIGURACION)
+    cursor.execute(f'''
+        INSERT INTO station_config_history ({campos}, updated_at)
+        SELECT {campos}, updated_at FROM station_config ORDER BY id
+    ''')
+    cursor.execute('DELETE FROM station_config WHERE id <> (SELECT MAX(id) FROM station_config)')
+    cursor.execute('UPDATE station_config SET id = 1')
+
+def fts5_disponible(cursor):
+    """Indica si la versión de SQLite incluye el módulo FTS5"""
+    cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+    return bool(cursor.fetchone()[0])
+
+# Una fila está en el índice FTS si es posterior a su creación o si ya la alcanzó el indexado inicial
+FTS_INDEXADA = '''
+    (old.id > (SELECT CAST(valor AS INTEGER) FROM logbook_meta WHERE clave = 'fts_pendiente_hasta')
+     OR old.id <= (SELECT CAST(valor AS INTEGER) FROM logbook_meta WHERE clave = 'fts_indexado_hasta'))
+'''
+# Cierto salvo mientras archivar_anio() mueve filas a un archivo anual
+SIN_ARCHIVAR = "NOT EXISTS (SELECT 1 FROM logbook_meta WHERE clave = 'archivando')"
+
+def migrar_busqueda_texto(cursor):
+    """Crea el índice FTS5 sobre comentario, nombre y QTH y los triggers que lo sincronizan
+    
+    Las filas existentes se indexan después por tramos con indexar_busqueda_pendiente().
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS logbook_meta (
+            clave TEXT PRIMARY KEY,
+            valor TEXT
+        )
+    ''')
+    if not fts5_disponible(cursor):
+        print("[WARN] SQLite sin FTS5: la búsqueda de texto usará LIKE sin índice")
+        return
+    
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS logbook_fts
+        USING fts5(comment, name, qth, content='logbook', content_rowid='id')
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS logbook_fts_ai AFTER INSERT ON logbook BEGIN
+            INSERT INTO logbook_fts (rowid, comment, name, qth) VALUES (new.id, new.comment, new.name, new.qth);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS logbook_fts_ad AFTER DELETE ON logbook WHEN {FTS_INDEXADA} BEGIN
+            INSERT INTO logbook_fts (logbook_fts, rowid, comment, name, qth)
+            VALUES ('delete', old.id, old.comment, old.name, old.qth);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS logbook_fts_au AFTER UPDATE OF comment, name, qth ON logbook WHEN {FTS_INDEXADA} BEGIN
+            INSERT INTO logbook_fts (logbook_fts, rowid, comment, name, qth)
+            VALUES ('delete', old.id, old.comment, old.name, old.qth);
+            INSERT INTO logbook_fts (rowid, comment, name, qth) VALUES (new.id, new.comment, new.name, new.qth);
+        END
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO logbook_meta (clave, valor)
+        SELECT 'fts_pendiente_hasta', COALESCE(MAX(id), 0) FROM logbook
+    ''')
+    cursor.execute("INSERT OR REPLACE INTO logbook_meta (clave, valor) VALUES ('fts_indexado_hasta', 0)")
+
+# Tablas de resumen: (tabla, columnas clave, expresión de cada clave sobre la fila {f})
+TABLAS_ESTADISTICAS = [
+    ('stats_banda', ['band'], ['{f}.band']),
+    ('stats_modo', ['mode'], ['{f}.mode']),
+    ('stats_banda_modo', ['band', 'mode'], ['{f}.band', '{f}.mode']),
+    ('stats_anio', ['anio'], ['substr({f}.timestamp, 1, 4)']),
+    ('stats_indicativo', ['contact_call'], ['{f}.contact_call'])
+]
+
+def sql_sumar_estadisticas(fila):
+    """Sentencias de trigger que cuentan la fila ('new') en todas las tablas de resumen"""
+    sentencias = [
+        # El indicativo es nuevo si aún no tiene fila en stats_indicativo
+        f"UPDATE stats_totales SET qsos = qsos + 1, indicativos = indicativos + "
+        f"NOT EXISTS (SELECT 1 FROM stats_indicativo WHERE contact_call = {fila}.contact_call);"
+    ]
+    for tabla, claves, expresiones in TABLAS_ESTADISTICAS:
+        valores = [e.format(f=fila) for e in expresiones]
+        condicion = ' AND '.join(f"{c} = {v}" for c, v in zip(claves, valores))
+        sentencias.append(f"INSERT OR IGNORE INTO {tabla} ({', '.join(claves)}, qsos) VALUES ({', '.join(valores)}, 0);")
+        sentencias.append(f"UPDATE {tabla} SET qsos = qsos + 1 WHERE {condicion};")
+    return '\n'.join(sentencias)
+
+def sql_restar_estadisticas(fila):
+    """Sentencias de trigger que descuentan la fila ('old') de todas las tablas de resumen"""
+    sentencias = []
+    for tabla, claves, expresiones in TABLAS_ESTADISTICAS:
+        valores = [e.format(f=fila) for e in expresiones]
+        condicion = ' AND '.join(f"{c} = {v}" for c, v in zip(claves, valores))
+        sentencias.append(f"UPDATE {tabla} SET qsos = qsos - 1 WHERE {condicion};")
+        if tabla == 'stats_indicativo':
+            sentencias.append(
+                f"UPDATE stats_totales SET qsos = qsos - 1, indicativos = indicativos - "
+                f"EXISTS (SELECT 1 FROM stats_indicativo WHERE {condicion} AND qsos = 0);"
+            )
+        sentencias.append(f"DELETE FROM {tabla} WHERE {condicion} AND qsos = 0;")
+    return '\n'.join(sentencias)
+
+def migrar_estadisticas(cursor):
+    """Crea las tablas de resumen, los triggers que las mantienen y las llena con el log actual"""
+    for tabla, claves, _ in TABLAS_ESTADISTICAS:
+        columnas = ', '.join(f"{c} TEXT NOT NULL" for c in claves)
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {tabla} (
+                {columnas},
+                qsos INTEGER NOT NULL,
+                PRIMARY KEY ({', '.join(claves)})
+            ) WITHOUT ROWID
+        ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_totales (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            qsos INTEGER NOT NULL,
+            indicativos INTEGER NOT NULL
+        )
+    ''')
+    
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS logbook_stats_ai AFTER INSERT ON logbook BEGIN
+            {sql_sumar_estadisticas('new')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS logbook_stats_ad AFTER DELETE ON logbook BEGIN
+            {sql_restar_estadisticas('old')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS logbook_stats_au
+        AFTER UPDATE OF contact_call, band, mode, timestamp ON logbook BEGIN
+            {sql_restar_estadisticas('old')}
+            {sql_sumar_estadisticas('new')}
+        END
+    ''')
+    
+    reconstruir_estadisticas(cursor)
+
+def reconstruir_estadisticas(cursor, origen='logbook'):
+    """Recalcula todas las tablas de resumen a partir de 'origen' (el logbook o VISTA_HISTORIAL)"""
+    for tabla, claves, expresiones in TABLAS_ESTADISTICAS:
+        valores = ', '.join(e.format(f=origen) for e in expresiones)
+        cursor.execute(f'DELETE FROM {tabla}')
+        cursor.execute(f'''
+            INSERT INTO {tabla} ({', '.join(claves)}, qsos)
+            SELECT {valores}, COUNT(*) FROM {origen} GROUP BY {valores}
+        ''')
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO stats_totales (id, qsos, indicativos)
+        SELECT 1, (SELECT COUNT(*) FROM {origen}), (SELECT COUNT(*) FROM stats_indicativo)
+    ''')
+
+def migrar_archivo_anual(cursor):
+    """Crea el registro de archivos anuales y hace que archivar no descuente de las estadísticas ni del índice FTS
+    
+    Los contactos movidos a un archivo anual siguen en el historial, así que mientras
+    archivar_anio() borra del logbook (con la marca 'archivando' en logbook_meta) los
+    triggers de borrado no tocan las tablas de resumen ni el índice de texto, que sigue
+    apuntando a sus id.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS logbook_archivo (
+            anio INTEGER PRIMARY KEY,
+            archivo TEXT NOT NULL,
+            qsos INTEGER NOT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('DROP TRIGGER IF EXISTS logbook_stats_ad')
+    cursor.execute(f'''
+        CREATE TRIGGER logbook_stats_ad AFTER DELETE ON logbook WHEN {SIN_ARCHIVAR} BEGIN
+            {sql_restar_estadisticas('old')}
+        END
+    ''')
+    if tabla_existe(cursor, 'logbook_fts'):
+        cursor.execute('DROP TRIGGER IF EXISTS logbook_fts_ad')
+        cursor.execute(f'''
+            CREATE TRIGGER logbook_fts_ad AFTER DELETE ON logbook WHEN {FTS_INDEXADA} AND {SIN_ARCHIVAR} BEGIN
+                INSERT INTO logbook_fts (logbook_fts, rowid, comment, name, qth)
+                VALUES ('delete', old.id, old.comment, old.name, old.qth);
+            END
+        ''')
+
+# Cada migración es (versión, descripción, pasos); los pasos son sentencias SQL
+# o una función que recibe el cursor. La versión aplicada se guarda en PRAGMA user_version.
+MIGRACIONES = [
+    (1, "Índices para listado, duplicados y exportación diaria", [
+        'CREATE INDEX IF NOT EXISTS idx_logbook_timestamp ON logbook (timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_logbook_call_timestamp ON logbook (contact_call, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_logbook_created_at ON logbook (created_at)'
+    ]),
+    (2, "Región IARU en la configuración de la estación", [
+        'ALTER TABLE station_config ADD COLUMN iaru_region TEXT'
+    ]),
+    (3, "Configuración de estación en una sola fila con historial aparte", migrar_configuracion_unica),
+    (4, "Índice de texto completo para búsquedas", migrar_busqueda_texto),
+    (5, "Marcas de exportación incremental por destino", [
+        '''
+            CREATE TABLE IF NOT EXISTS export_watermark (
+                destino TEXT PRIMARY KEY,
+                ultimo_id INTEGER NOT NULL,
+                ultimo_created_at DATETIME,
+                archivo TEXT,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        '''
+    ]),
+    (6, "Estadísticas materializadas mantenidas por triggers", migrar_estadisticas),
+    (7, "Distancia y rumbo de cada contacto desde el locator de la estación", [
+        'ALTER TABLE logbook ADD COLUMN distance_km REAL',
+        'ALTER TABLE logbook ADD COLUMN bearing REAL',
+        # Contactos con locator aún sin calcular; calcular_geometria_pendiente() los recorre por tramos
+        '''
+            CREATE INDEX IF NOT EXISTS idx_logbook_geometria_pendiente ON logbook (id)
+            WHERE distance_km IS NULL AND grid_locator <> ''
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_logbook_banda_distancia ON logbook (band, distance_km)'
+    ]),
+    (8, "Fecha y hora de cada contacto como entero UTC para ordenar y filtrar", [
+        'ALTER TABLE logbook ADD COLUMN ts_epoch INTEGER',
+        # Contactos aún sin convertir; calcular_epoch_pendiente() los recorre por tramos
+        'CREATE INDEX IF NOT EXISTS idx_logbook_epoch_pendiente ON logbook (id) WHERE ts_epoch IS NULL',
+        'CREATE INDEX IF NOT EXISTS idx_logbook_ts_epoch ON logbook (ts_epoch)',
+        'CREATE INDEX IF NOT EXISTS idx_logbook_call_ts_epoch ON logbook (contact_call, ts_epoch)',
+        # Orden, duplicados y rangos pasan a ts_epoch; los índices sobre el texto sobran
+        'DROP INDEX IF EXISTS idx_logbook_timestamp',
+        'DROP INDEX IF EXISTS idx_logbook_call_timestamp'
+    ]),
+    (9, "Archivos anuales adjuntos para los años cerrados", migrar_archivo_anual),
+]
+
+def migrar_base(conn):
+    """Aplica las migraciones pendientes; no hace nada si el esquema está al día"""
+    version_actual = conn.execute('PRAGMA user_version').fetchone()[0]
+    pendientes = [m for m in MIGRACIONES if m[0] > version_actual]
+    if not pendientes:
+        return
+    
+    inicio = time.perf_counter()
+    for version, descripcion, pasos in pendientes:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        try:
+            if callable(pasos):
+                pasos(cursor)
+            else:
+                for sql in pasos:
+                    cursor.execute(sql)
+            cursor.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        print(f"[INFO] Migración {version} aplicada: {descripcion}")
+    
+    print(f"[INFO] Base de datos actualizada a la versión {pendientes[-1][0]} "
+          f"en {time.perf_counter() - inicio:.2f} s")
+
+#### FUNCIONES DE CONFIGURACIÓN ####
+CAMPOS_CONFIGURACION = ['my_call', 'power', 'location', 'grid_locator', 'antenna', 'equipment', 'iaru_region']
+_configuracion = {}  # Caché de la configuración activa; guardar_configuracion() la mantiene al día
+
+def cargar_configuracion():
+    """Retorna una copia de la configuración de la estación, leyéndola de la base solo la primera vez"""
+    if not _configuracion:
+        with conexion_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'SELECT {", ".join(CAMPOS_CONFIGURACION)} FROM station_config WHERE id = 1')
+            fila = cursor.fetchone()
+        
+        config = dict(zip(CAMPOS_CONFIGURACION, fila)) if fila else {campo: '' for campo in CAMPOS_CONFIGURACION}
+        config['iaru_region'] = config['iaru_region'] or REGION_IARU_PREDETERMINADA
+        _configuracion.update(config)
+    
+    return dict(_configuracion)
 
 def guardar_configuracion(config):
-    """Guarda la configuración de la estación en la base de datos"""
+    """Guarda la configuración activa de la estación y la añade al historial"""
+    campos = ", ".join(CAMPOS_CONFIGURACION)
+    marcadores = ", ".join('?' * len(CAMPOS_CONFIGURACION))
+    valores = tuple(config[campo] for campo in CAMPOS_CONFIGURACION)
+    
     with conexion_db() as conn:
         cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO station_config 
-            (my_call, power, location, grid_locator, antenna, equipment)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            config['my_call'],
-            config['power'],
-            config['location'],
-            config['grid_locator'],
-            config['antenna'],
-            config['equipment']
-        ))
+        cursor.execute(f'''
+            INSERT OR REPLACE INTO station_config (id, {campos}, updated_at)
+            VALUES (1, {marcadores}, CURRENT_TIMESTAMP)
+        ''', valores)
+        cursor.execute(f'''
+            INSERT INTO station_config_history ({campos})
+            VALUES ({marcadores})
+        ''', valores)
+    
+    _configuracion.clear()
+    _configuracion.update(zip(CAMPOS_CONFIGURACION, valores))
+    cargar_plan_bandas(config['iaru_region'])
+    # Los contactos registrados sin locator de estación se calculan en cuanto lo hay
+    calcular_geometria_pendiente()
+
+#### FILTROS DE CONTACTOS ####
+CLAVES_FILTRO = (
+    'id', 'id_despues', 'id_hasta', 'indicativo', 'bandas', 'modos', 'desde', 'hasta',
+    'creado_desde', 'creado_hasta', 'con_locator', 'distancia_minima'
+)
+# Claves del filtro escrito en el menú (clave=valor) -> clave de CLAVES_FILTRO
+CLAVES_FILTRO_MENU = {
+    'indicativo': 'indicativo', 'banda': 'bandas', 'modo': 'modos', 'desde': 'desde',
+    'hasta': 'hasta', 'locator': 'con_locator', 'distancia': 'distancia_minima'
+}
+
+def compilar_filtro(filtro):
+    """Convierte un filtro en (condición SQL, parámetros) sobre las columnas de logbook
+    
+    El filtro es un diccionario con claves de CLAVES_FILTRO; las que valen None se ignoran.
+    Cada condición compara la columna tal cual, por igualdad, lista o rango y nunca
+    envuelta en una función, para que SQLite pueda resolverla con un índice. Los
+    límites 'desde' son inclusivos y los 'hasta' exclusivos, salvo 'id_hasta'; 'desde'
+    y 'hasta' son segundos UTC (ts_epoch) y los de created_at, texto.
+    """
+    filtro = {clave: valor for clave, valor in (filtro or {}).items() if valor is not None}
+    desconocidas = set(filtro) - set(CLAVES_FILTRO)
+    if desconocidas:
+        raise ValueError(f"Claves de filtro desconocidas: {', '.join(sorted(desconocidas))}")
+    
+    condiciones = []
+    params = []
+    if 'id' in filtro:
+        condiciones.append('id = ?')
+        params.append(filtro['id'])
+    if 'id_despues' in filtro:
+        condiciones.append('id > ?')
+        params.append(filtro['id_despues'])
+    if 'id_hasta' in filtro:
+        condiciones.append('id <= ?')
+        params.append(filtro['id_hasta'])
+    if 'indicativo' in filtro:
+        desde, hasta = rango_indicativo(filtro['indicativo'])
+        if filtro['indicativo'].strip().endswith('*'):
+            condiciones.append('contact_call >= ? AND contact_call < ?')
+            params.extend((desde, hasta))
+        else:
+            condiciones.append('contact_call = ?')
+            params.append(desde)
+    if 'bandas' in filtro:
+        bandas = [banda.lower() for banda in filtro['bandas']]
+        condiciones.append(f"band IN ({', '.join('?' * len(bandas))})")
+        params.extend(bandas)
+    if 'modos' in filtro:
+        modos = [modo.upper() for modo in filtro['modos']]
+        condiciones.append(f"mode IN ({', '.join('?' * len(modos))})")
+        params.extend(modos)
+    if 'desde' in filtro:
+        condiciones.append('ts_epoch >= ?')
+        params.append(filtro['desde'])
+    if 'hasta' in filtro:
+        condiciones.append('ts_epoch < ?')
+        params.append(filtro['hasta'])
+    if 'creado_desde' in filtro:
+        condiciones.append('created_at >= ?')
+        params.append(filtro['creado_desde'])
+    if 'creado_hasta' in filtro:
+        condiciones.append('created_at < ?')
+        params.append(filtro['creado_hasta'])
+    if 'con_locator' in filtro:
+        # "> ''" deja fuera a la vez NULL y la cadena vacía
+        condiciones.append("grid_locator > ''" if filtro['con_locator'] else "(grid_locator IS NULL OR grid_locator = '')")
+    if 'distancia_minima' in filtro:
+        condiciones.append('distance_km >= ?')
+        params.append(filtro['distancia_minima'])
+    
+    return ' AND '.join(condiciones), params
+
+def consulta_filtrada(filtro, columnas='*', orden=None, origen=VISTA_HISTORIAL):
+    """Retorna (sql, parámetros) de un SELECT con el filtro y el orden indicados
+    
+    Por defecto consulta el historial completo, archivos anuales incluidos; con
+    origen='logbook', solo la base principal.
+    """
+    condicion, params = compilar_filtro(filtro)
+    sql = f'SELECT {columnas} FROM {origen}'
+    if condicion:
+        sql += f' WHERE {condicion}'
+    if orden:
+        sql += f' ORDER BY {orden}'
+    return sql, params
+
+def rango_indicativo(texto):
+    """Retorna el rango [desde, hasta) de contact_call de un indicativo exacto o de un prefijo con '*' final"""
+    texto = texto.strip()
+    indicativo = texto.upper().rstrip('*')
+    if not indicativo:
+        raise ValueError(f"Indicativo vacío: {texto!r}")
+    if texto.endswith('*'):
+        return indicativo, indicativo[:-1] + chr(ord(indicativo[-1]) + 1)
+    return indicativo, indicativo + '\0'
+
+def limites_timestamp(desde=None, hasta=None):
+    """Convierte límites (fecha/hora, es_solo_fecha) incluidos en los 'desde' y 'hasta' de un filtro
+    
+    El límite superior pasa a ser exclusivo: el día siguiente si solo se dio la fecha,
+    o el segundo siguiente.
+    """
+    filtro = {}
+    if desde:
+        filtro['desde'] = calendar.timegm(desde[0].timetuple())
+    if hasta:
+        dt, solo_fecha = hasta
+        dt += datetime.timedelta(days=1) if solo_fecha else datetime.timedelta(seconds=1)
+        filtro['hasta'] = calendar.timegm(dt.timetuple())
+    return filtro
+
+def analizar_filtro(texto):
+    """Convierte un filtro escrito como 'clave=valor ...' en el menú en un filtro
+    
+    Ejemplo: 'indicativo=EA8* banda=20m,40m modo=FT8 desde=2024-01-01 hasta=2024-12-31
+    locator=si distancia=1000'. Lanza ValueError si algo no se entiende.
+    """
+    filtro = {}
+    limites = {}
+    for parte in texto.split():
+        clave, separador, valor = parte.partition('=')
+        clave = CLAVES_FILTRO_MENU.get(clave.lower())
+        if not separador or not clave or not valor:
+            raise ValueError(f"No se entiende '{parte}'; usa {', '.join(CLAVES_FILTRO_MENU)} con clave=valor")
+        if clave in ('bandas', 'modos'):
+            filtro[clave] = [v for v in valor.split(',') if v]
+        elif clave in ('desde', 'hasta'):
+            limites[clave] = analizar_fecha_limite(valor)
+        elif clave == 'con_locator':
+            filtro[clave] = valor.lower() in ('si', 'sí', 's')
+        elif clave == 'distancia_minima':
+            filtro[clave] = float(valor)
+        else:
+            rango_indicativo(valor)  # Un '*' solo no es un prefijo
+            filtro[clave] = valor
+    filtro.update(limites_timestamp(limites.get('desde'), limites.get('hasta')))
+    return filtro
+
+def pedir_filtro():
+    """Pide un filtro en el menú; retorna {} si se deja vacío o None si no se entiende"""
+    texto = input("Filtro (p. ej. indicativo=EA8* banda=20m,40m modo=FT8 desde=2024-01-01 locator=si) "
+                  "[Enter: todos]: ").strip()
+    try:
+        return analizar_filtro(texto)
+    except ValueError as e:
+        print(f"{RED}{e}{RESET}")
+        return None
 
 #### FUNCIONES DEL LOGBOOK ####
 def agregar_entrada():
@@ -157,21 +1206,20 @@ def agregar_entrada():
     config = cargar_configuracion()
     
     if not config['my_call']:
-        print("\nAdvertencia: Configura tu estación primero (Opción 5).")
+        print("\nAdvertencia: Configura tu estación primero (Opción 6).")
         return
     
     print("\n--- Añadir nueva entrada ---")
     
     datos = obtener_datos_entrada(config)
+    if datos is None:
+        print("\nEntrada descartada.")
+        return
     
+    distancia, rumbo = geometria.distancia_rumbo(config['grid_locator'], datos['contact_grid'])
     with conexion_db() as conn:
         cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO logbook 
-            (my_call, contact_call, frequency, band, mode, timestamp, 
-             rst_sent, rst_received, comment, qth, name, power, grid_locator)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        cursor.execute(SQL_INSERTAR_QSO, QSO(
             config['my_call'],
             datos['contact_call'],
             datos['frequency'],
@@ -183,20 +1231,47 @@ def agregar_entrada():
             datos['comment'],
             datos['qth'],
             datos['name'],
+            datos['contact_grid'],
             datos['power'],
-            datos['contact_grid']
+            datos['ts_epoch'],
+            distancia,
+            rumbo
         ))
     
+    if _estado_concurso['activo']:
+        registrar_qso_concurso(datos['contact_call'], datos['band'], datos['mode'], datos['ts_epoch'])
+    
     print("\n¡Entrada añadida correctamente!")
 
 def obtener_datos_entrada(config):
-    """Recopila los datos para una nueva entrada"""
+    """Recopila los datos para una nueva entrada; retorna None si se descarta por duplicada"""
+    contact_call = input("Indicativo del contacto: ").strip().upper()
+    if _estado_concurso['activo']:
+        avisar_trabajado_concurso(contact_call)
+    
     datos = {
-        'contact_call': input("Indicativo del contacto: ").strip().upper(),
+        'contact_call': contact_call,
         'frequency': obtener_frecuencia_valida(),
         'band': determinar_banda(0),  # Se actualiza después
         'mode': input("Modo (SSB, CW, FT8, etc.): ").strip().upper(),
-        'timestamp': obtener_timestamp(),
+        'timestamp': obtener_timestamp()
+    }
+    
+    datos['ts_epoch'] = epoch_de_timestamp(datos['timestamp'])
+    
+    # Calcular banda basada en la frecuencia
+    datos['band'] = determinar_banda(datos['frequency'])
+    print(f"Banda calculada: {datos['band']}")
+    
+    if _estado_concurso['activo']:
+        anterior = buscar_duplicado_concurso(contact_call, datos['band'], datos['mode'], datos['ts_epoch'])
+        if anterior is not None:
+            print(f"{RED}¡DUPLICADO! {contact_call} ya trabajado en {datos['band']} {datos['mode']} "
+                  f"a las {timestamp_de_epoch(anterior)}{RESET}")
+            if input("¿Registrar de todos modos? (s/N): ").strip().lower() != 's':
+                return None
+    
+    datos.update({
         'rst_sent': input("RST enviado (opcional): ").strip(),
         'rst_received': input("RST recibido (opcional): ").strip(),
         'name': input("Nombre (opcional): ").strip(),
@@ -204,11 +1279,7 @@ def obtener_datos_entrada(config):
         'contact_grid': input("Grid Locator del contacto (opcional): ").strip().upper(),
         'comment': input("Comentario (opcional, dejar en blanco para texto automático): ").strip(),
         'power': None
-    }
-    
-    # Calcular banda basada en la frecuencia
-    datos['band'] = determinar_banda(datos['frequency'])
-    print(f"Banda calculada: {datos['band']}")
+    })
     
     # Comentario automático si no se especifica
     if not datos['comment'] and datos['name']:
@@ -229,237 +1300,1332 @@ def obtener_datos_entrada(config):
     
     return datos
 
-def listar_entradas():
-    """Lista todas las entradas del logbook"""
-    config = cargar_configuracion()
-    print(f"{GREEN}Libro de guardia de: {config.get('my_call', '')} {RESET}")
-    print(f"{MAGENTA}{'ID':<8} {'Fecha y Hora':<16} {'Estación':<20} {'Banda y modo':<20} {'Comentario':<40}{RESET}")
+#### MODO CONCURSO ####
+# Índice en memoria {indicativo: {(banda, modo): último ts_epoch}} de los contactos del concurso
+_concurso = {}
+_estado_concurso = {'activo': False, 'minutos': None}
+
+def alternar_modo_concurso():
+    """Activa o desactiva el modo concurso con aviso inmediato de duplicados"""
+    if _estado_concurso['activo']:
+        _concurso.clear()
+        _estado_concurso['activo'] = False
+        print("\nModo concurso desactivado.")
+        return
+    
+    print("\n--- Activar modo concurso ---")
+    while True:
+        inicio = input("Inicio del concurso (UTC, YYYY-MM-DD HH:MM, vacío para las últimas 48 h): ").strip()
+        try:
+            desde = (datetime.datetime.strptime(inicio, '%Y-%m-%d %H:%M') if inicio
+                     else datetime.datetime.now(timezone.utc).replace(tzinfo=None) - datetime.timedelta(hours=48))
+            break
+        except ValueError:
+            print("Formato inválido. Usa YYYY-MM-DD HH:MM o deja vacío.")
+    
+    ventana = input("Minutos tras los que se puede repetir un contacto (vacío = nunca): ").strip()
+    try:
+        minutos = int(ventana) if ventana else None
+    except ValueError:
+        print("Valor no válido, los duplicados cuentan durante todo el concurso.")
+        minutos = None
+    
+    qsos = activar_modo_concurso(calendar.timegm(desde.timetuple()), minutos)
+    print(f"Modo concurso activo: {qsos} combinaciones de indicativo/banda/modo de {len(_concurso)} indicativos.")
+
+def activar_modo_concurso(desde, ventana_minutos=None):
+    """Carga en memoria los contactos desde 'desde' (segundos UTC) y retorna las combinaciones cargadas"""
+    _concurso.clear()
+    _estado_concurso['minutos'] = ventana_minutos
+    _estado_concurso['activo'] = True
     
     with conexion_db() as conn:
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT id, timestamp, my_call, contact_call, frequency, band, mode, comment
-            FROM logbook 
-            ORDER BY timestamp DESC
-        ''')
-        entries = cursor.fetchall()
+            SELECT contact_call, band, mode, MAX(ts_epoch) FROM logbook
+            WHERE ts_epoch >= ?
+            GROUP BY contact_call, band, mode
+        ''', (desde,))
+        total = 0
+        for contact_call, band, mode, ts_epoch in cursor:
+            _concurso.setdefault(contact_call, {})[(band, mode)] = ts_epoch
+            total += 1
+    return total
+
+def registrar_qso_concurso(contact_call, band, mode, ts_epoch):
+    """Añade un contacto recién registrado al índice del concurso"""
+    trabajados = _concurso.setdefault(contact_call, {})
+    anterior = trabajados.get((band, mode))
+    if anterior is None or ts_epoch > anterior:
+        trabajados[(band, mode)] = ts_epoch
+
+def avisar_trabajado_concurso(contact_call):
+    """Muestra en qué bandas y modos ya se trabajó un indicativo durante el concurso"""
+    trabajados = _concurso.get(contact_call)
+    if trabajados:
+        detalle = ', '.join(f"{band} {mode} ({time.strftime('%H:%M', time.gmtime(ts))})"
+                            for (band, mode), ts in sorted(trabajados.items()))
+        print(f"{MAGENTA}Ya trabajado en el concurso: {detalle}{RESET}")
+    else:
+        print(f"{GREEN}Indicativo nuevo en el concurso{RESET}")
+
+def buscar_duplicado_concurso(contact_call, band, mode, ts_epoch):
+    """Retorna el ts_epoch del contacto anterior si el nuevo es duplicado, o None"""
+    anterior = _concurso.get(contact_call, {}).get((band, mode))
+    if anterior is None or anterior > ts_epoch:
+        return None
+    minutos = _estado_concurso['minutos']
+    if minutos is not None and ts_epoch - anterior >= minutos * 60:
+        return None
+    return anterior
+
+def listar_entradas():
+    """Navega por las entradas del logbook, todas o las de un filtro, página a página"""
+    config = cargar_configuracion()
+    print(f"{GREEN}Libro de guardia de: {config.get('my_call', '')} {RESET}")
     
-    if not entries:
-        print("No hay entradas en el logbook.")
+    filtro = pedir_filtro()
+    if filtro is None:
+        return
+    pagina = obtener_pagina_entradas(filtro=filtro)
+    if not pagina:
+        print("No hay entradas que mostrar.")
         return
     
-    for entry in entries:
-        print(f"{entry[0]}. {entry[1]:<15} | {entry[3]:<10} | {entry[4]} MHz ({entry[5]}) {entry[6]:<10} | {entry[7]}")
+    while True:
+        imprimir_pagina_entradas(pagina)
+        opcion = input("\n[Enter] siguiente, [a] anterior, [f AAAA-MM-DD] ir a fecha, "
+                       "ID para ver detalles, [q] salir: ").strip().lower()
+        
+        if opcion == 'q':
+            return
+        elif opcion == '':
+            siguiente = obtener_pagina_entradas(antes=clave_pagina(pagina[-1]), filtro=filtro)
+            if siguiente:
+                pagina = siguiente
+            else:
+                print("No hay más entradas.")
+        elif opcion == 'a':
+            anterior = obtener_pagina_entradas(despues=clave_pagina(pagina[0]), filtro=filtro)
+            if anterior:
+                pagina = anterior
+            else:
+                print("Ya estás en la primera página.")
+        elif opcion.startswith('f'):
+            try:
+                fecha = datetime.datetime.strptime(opcion[1:].strip(), '%Y-%m-%d')
+            except ValueError:
+                print("Fecha no válida. Usa AAAA-MM-DD.")
+                continue
+            # Entradas de ese día y anteriores: todo lo que sea menor que el día siguiente
+            dia_siguiente = calendar.timegm((fecha + datetime.timedelta(days=1)).timetuple())
+            destino = obtener_pagina_entradas(antes=(dia_siguiente, 0), filtro=filtro)
+            if destino:
+                pagina = destino
+            else:
+                print("No hay entradas en esa fecha o anteriores.")
+        else:
+            try:
+                mostrar_detalles_entrada(int(opcion))
+            except ValueError:
+                print("ID no válido.")
+
+def obtener_pagina_entradas(antes=None, despues=None, limite=TAM_PAGINA, filtro=None):
+    """Retorna una página del listado (más recientes primero) por paginación de clave (ts_epoch, id)
+    
+    'antes' devuelve las entradas que siguen a esa clave en el listado y
+    'despues' las que la preceden; sin ninguna de las dos, la primera página.
+    Si antes de 'despues' no queda una página completa se retorna la primera, que
+    siempre está llena si hay entradas suficientes. Solo se listan las entradas que
+    cumplen 'filtro' (ver compilar_filtro()).
+    """
+    condicion, params = compilar_filtro(filtro)
+    condiciones = [condicion] if condicion else []
+    if despues:
+        condiciones.append('(ts_epoch, id) > (?, ?)')
+        params.extend(despues)
+        orden = 'ts_epoch ASC, id ASC'
+    else:
+        if antes:
+            condiciones.append('(ts_epoch, id) < (?, ?)')
+            params.extend(antes)
+        orden = 'ts_epoch DESC, id DESC'
     
-    entry_id = input("\nIntroduce el ID para ver detalles (o Enter para continuar): ").strip()
-    if entry_id:
-        try:
-            mostrar_detalles_entrada(int(entry_id))
-        except ValueError:
-            print("ID no válido.")
+    sql = f'SELECT {COLUMNAS_LISTADO} FROM {VISTA_HISTORIAL}'
+    if condiciones:
+        sql += ' WHERE ' + ' AND '.join(condiciones)
+    with conexion_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'{sql} ORDER BY {orden} LIMIT ?', (*params, limite))
+        pagina = cursor.fetchall()
+    if despues and len(pagina) < limite:
+        return obtener_pagina_entradas(limite=limite, filtro=filtro)
+    return pagina[::-1] if despues else pagina
+
+def clave_pagina(entry):
+    """Retorna la clave de paginación (ts_epoch, id) de una fila del listado"""
+    return (entry[1], entry[0])
+
+def imprimir_pagina_entradas(pagina):
+    """Muestra una página del listado"""
+    print(f"\n{MAGENTA}{'ID':<8} {'Fecha y Hora':<16} {'Estación':<20} {'Banda y modo':<20} {'Distancia':<14} {'Comentario':<40}{RESET}")
+    for entry in pagina:
+        distancia = f"{entry[8]:.0f} km {entry[9]:.0f}°" if entry[8] is not None else "-"
+        print(f"{entry[0]}. {timestamp_de_epoch(entry[1]):<15} | {entry[3]:<10} | {entry[4]} MHz ({entry[5]}) {entry[6]:<10} | {distancia:<14} | {entry[7]}")
 
 def mostrar_detalles_entrada(entry_id):
     """Muestra los detalles completos de una entrada"""
+    sql, params = consulta_filtrada({'id': entry_id}, ', '.join(CAMPOS_QSO))
     with conexion_db() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM logbook WHERE id = ?', (entry_id,))
-        entry = cursor.fetchone()
+        cursor.execute(sql, params)
+        fila = cursor.fetchone()
     
-    if not entry:
+    if not fila:
         print("Entrada no encontrada.")
         return
     
+    entry = QSO(*fila)
     print("\n--- Detalles de la entrada ---")
     detalles = [
-        ("Indicativo", entry[2]),
-        ("Contacto", entry[3]),
-        ("Frecuencia", f"{entry[4]} MHz"),
-        ("Banda", entry[5]),
-        ("Modo", entry[6]),
-        ("Fecha/Hora", entry[7]),
-        ("RST enviado", entry[8]),
-        ("RST recibido", entry[9]),
-        ("Comentario", entry[10]),
-        ("QTH", entry[11]),
-        ("Nombre", entry[12]),
-        ("Potencia", f"{entry[13]} W" if entry[13] else None),
-        ("Grid Locator", entry[14])
+        ("Indicativo", entry.my_call),
+        ("Contacto", entry.contact_call),
+        ("Frecuencia", f"{entry.frequency} MHz" if entry.frequency is not None else None),
+        ("Banda", entry.band),
+        ("Modo", entry.mode),
+        ("Fecha/Hora", entry.timestamp),
+        ("RST enviado", entry.rst_sent),
+        ("RST recibido", entry.rst_received),
+        ("Comentario", entry.comment),
+        ("QTH", entry.qth),
+        ("Nombre", entry.name),
+        ("Potencia", f"{entry.power} W" if entry.power else None),
+        ("Grid Locator", entry.grid_locator),
+        ("Distancia", f"{entry.distance_km:.0f} km, rumbo {entry.bearing:.0f}°" if entry.distance_km is not None else None)
     ]
     
     for nombre, valor in detalles:
         if valor:
             print(f"{nombre}: {valor}")
 
-#### FUNCIONES ADIF ####
-def exportar_adif():
-    """Exporta el logbook a un archivo ADIF"""
-    print("\n--- Exportar a ADIF ---")
-    filename = input("Nombre del archivo (sin extensión): ").strip() or "hamradio_logbook"
-    filename += ".adi"
+def buscar_entradas():
+    """Busca contactos por indicativo o texto y muestra los resultados página a página"""
+    print("\n--- Buscar contactos ---")
+    texto = input("Indicativo (EA8* para prefijo) o texto en comentario/nombre/QTH: ").strip()
+    if not texto:
+        return
+    
+    pagina, siguiente = buscar_contactos(texto)
+    if not pagina:
+        print("No se encontraron contactos.")
+        return
+    
+    while True:
+        imprimir_pagina_entradas(pagina)
+        opcion = input("\n[Enter] siguiente, ID para ver detalles, [q] salir: ").strip().lower()
+        
+        if opcion == 'q':
+            return
+        elif opcion == '':
+            if siguiente is None:
+                print("No hay más resultados.")
+                continue
+            pagina, siguiente = buscar_contactos(texto, despues=siguiente)
+            if not pagina:
+                print("No hay más resultados.")
+                return
+        else:
+            try:
+                mostrar_detalles_entrada(int(opcion))
+            except ValueError:
+                print("ID no válido.")
+
+def buscar_contactos(texto, despues=None, limite=TAM_PAGINA):
+    """Busca contactos y retorna (página, clave de la página siguiente o None)
+    
+    Un indicativo, o cualquier prefijo con '*' final, se busca por rango en el índice
+    de contact_call; cualquier otro texto, en el índice FTS5 de comentario, nombre y QTH
+    (o con LIKE si no hay FTS5). Las tres búsquedas cubren todo el historial.
+    """
+    columnas = ', '.join('l.' + col for col in COLUMNAS_LISTADO.split(', '))
+    texto = texto.strip()
     
     with conexion_db() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM logbook')
-        entries = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description]
-    
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write("HamRadio Logbook Export\n")
-        f.write("<ADIF_VER:5>3.1.0\n")
-        f.write("<PROGRAMID:11>HamLogbook\n")
-        f.write(f"<CREATED_TIMESTAMP:15>{datetime.datetime.now(timezone.utc).strftime('%Y%m%d %H%M%S')}\n")
-        f.write("<EOH>\n\n")
         
-        for entry in entries:
-            for col, val in zip(columns, entry):
-                if col == 'id' or val is None or val == '':
-                    continue
-                
-                tag = mapear_tag_adif(col)
-                if not tag:
-                    continue
-                
-                if col == 'timestamp':
-                    dt = datetime.datetime.strptime(val, '%Y-%m-%d %H:%M:%S')
-                    f.write(f"<{tag}:8>{dt.strftime('%Y%m%d')} <TIME_ON:6>{dt.strftime('%H%M%S')} ")
-                elif col == 'frequency':
-                    f.write(f"<{tag}:8>{val:.6f} ")
-                else:
-                    val_str = str(val)
-                    f.write(f"<{tag}:{len(val_str)}>{val_str} ")
+        if RE_INDICATIVO_BUSQUEDA.match(texto):
+            indicativo, hasta = rango_indicativo(texto)
+            cursor.execute(f'''
+                SELECT {columnas} FROM {VISTA_HISTORIAL} l
+                WHERE l.contact_call >= ? AND l.contact_call < ?
+                  AND (l.contact_call, l.ts_epoch, l.id) > (?, ?, ?)
+                ORDER BY l.contact_call, l.ts_epoch, l.id
+                LIMIT ?
+            ''', (indicativo, hasta, *(despues or ('', 0, 0)), limite))
+            pagina = cursor.fetchall()
+            clave = (pagina[-1][3], pagina[-1][1], pagina[-1][0]) if pagina else None
+        elif tabla_existe(cursor, 'logbook_fts'):
+            # Cada palabra se busca como prefijo; las comillas evitan la sintaxis de consulta de FTS5
+            consulta = ' '.join('"' + palabra.replace('"', '""') + '"*' for palabra in texto.split())
+            # El índice guarda también los id archivados; con IN, y no con JOIN, SQLite busca
+            # cada id por clave primaria en cada archivo en lugar de materializar la vista
+            cursor.execute(f'''
+                SELECT {columnas} FROM {VISTA_HISTORIAL} l
+                WHERE l.id IN (
+                    SELECT rowid FROM logbook_fts
+                    WHERE logbook_fts MATCH ? AND rowid < ?
+                    ORDER BY rowid DESC
+                    LIMIT ?
+                )
+                ORDER BY l.id DESC
+            ''', (consulta, despues or 2 ** 63 - 1, limite))
+            pagina = cursor.fetchall()
+            clave = pagina[-1][0] if pagina else None
+        else:
+            patron = f"%{texto}%"
+            cursor.execute(f'''
+                SELECT {columnas} FROM {VISTA_HISTORIAL} l
+                WHERE (l.comment LIKE ? OR l.name LIKE ? OR l.qth LIKE ?) AND l.id < ?
+                ORDER BY l.id DESC
+                LIMIT ?
+            ''', (patron, patron, patron, despues or 2 ** 63 - 1, limite))
+            pagina = cursor.fetchall()
+            clave = pagina[-1][0] if pagina else None
+    
+    return pagina, (clave if len(pagina) == limite else None)
+
+def tabla_existe(cursor, nombre):
+    """Indica si existe una tabla (o tabla virtual) en la base principal"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (nombre,))
+    return cursor.fetchone() is not None
+
+def indexar_busqueda_pendiente(tam_tramo=TAM_TRAMO_INDEXADO):
+    """Añade al índice FTS5 por tramos las filas anteriores a su creación; se puede interrumpir y reanudar"""
+    with conexion_db() as conn:
+        cursor = conn.cursor()
+        if not tabla_existe(cursor, 'logbook_fts'):
+            return
+        cursor.execute('''
+            SELECT
+                (SELECT CAST(valor AS INTEGER) FROM logbook_meta WHERE clave = 'fts_indexado_hasta'),
+                (SELECT CAST(valor AS INTEGER) FROM logbook_meta WHERE clave = 'fts_pendiente_hasta')
+        ''')
+        indexado, pendiente = cursor.fetchone()
+    
+    if indexado >= pendiente:
+        return
+    
+    print(f"[INFO] Indexando contactos para búsqueda (hasta el ID {pendiente})...")
+    inicio = time.perf_counter()
+    while indexado < pendiente:
+        tope = min(indexado + tam_tramo, pendiente)
+        # Cada tramo y su marca de avance se confirman juntos
+        with conexion_db() as conn:
+            conn.execute(f'''
+                INSERT INTO logbook_fts (rowid, comment, name, qth)
+                SELECT id, comment, name, qth FROM {VISTA_HISTORIAL} WHERE id > ? AND id <= ?
+            ''', (indexado, tope))
+            conn.execute("UPDATE logbook_meta SET valor = ? WHERE clave = 'fts_indexado_hasta'", (tope,))
+        indexado = tope
+    print(f"[INFO] Índice de búsqueda completado en {time.perf_counter() - inicio:.2f} s")
+
+def calcular_epoch_pendiente(tam_tramo=TAM_TRAMO_INDEXADO):
+    """Rellena por tramos ts_epoch en los contactos anteriores a la columna; se puede interrumpir y reanudar"""
+    convertidos = 0
+    inicio = time.perf_counter()
+    while True:
+        # Cada tramo se confirma por separado; un texto que SQLite no entiende queda en 0
+        with conexion_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE logbook SET ts_epoch = COALESCE(CAST(strftime('%s', timestamp) AS INTEGER), 0)
+                WHERE id IN (SELECT id FROM logbook WHERE ts_epoch IS NULL ORDER BY id LIMIT ?)
+            ''', (tam_tramo,))
+            if not cursor.rowcount:
+                break
+            convertidos += cursor.rowcount
+    
+    if convertidos:
+        print(f"[INFO] Fecha y hora de {convertidos} contactos convertidas en {time.perf_counter() - inicio:.2f} s")
+
+def calcular_geometria_pendiente(tam_tramo=TAM_TRAMO_INDEXADO):
+    """Calcula por tramos distancia y rumbo de los contactos con locator que aún no los tienen
+    
+    Usa el locator actual de la estación; se puede interrumpir y reanudar. Los locators
+    no válidos se quedan sin calcular y se vuelven a intentar en la siguiente ejecución.
+    """
+    origen = cargar_configuracion()['grid_locator']
+    if geometria.locator_a_coordenadas(origen) is None:
+        return
+    
+    ultimo_id = 0
+    calculados = 0
+    inicio = time.perf_counter()
+    while True:
+        # Cada tramo se confirma por separado
+        with conexion_db() as conn:
+            cursor = conn.cursor()
+            # Con sqlite_stat1 (PRAGMA optimize) el planificador prefiere idx_logbook_banda_distancia
+            # y recorre todo el log aunque no quede nada pendiente
+            cursor.execute('''
+                SELECT id, grid_locator FROM logbook INDEXED BY idx_logbook_geometria_pendiente
+                WHERE distance_km IS NULL AND grid_locator <> '' AND id > ?
+                ORDER BY id LIMIT ?
+            ''', (ultimo_id, tam_tramo))
+            filas = cursor.fetchall()
+            if not filas:
+                break
             
-            f.write("<EOR>\n")
+            resultados = geometria.distancias_rumbos(origen, [grid for _, grid in filas])
+            cursor.executemany(
+                'UPDATE logbook SET distance_km = ?, bearing = ? WHERE id = ?',
+                [(km, rumbo, id_) for (id_, _), (km, rumbo) in zip(filas, resultados) if km is not None]
+            )
+            calculados += cursor.rowcount
+            ultimo_id = filas[-1][0]
+    
+    if calculados:
+        print(f"[INFO] Distancia y rumbo de {calculados} contactos calculados en {time.perf_counter() - inicio:.2f} s")
+
+def completar_geometria(qsos):
+    """Retorna los QSO con distancia y rumbo desde el locator de la estación, calculados en lote"""
+    resultados = geometria.distancias_rumbos(cargar_configuracion()['grid_locator'], [qso.grid_locator for qso in qsos])
+    return [qso._replace(distance_km=km, bearing=rumbo) for qso, (km, rumbo) in zip(qsos, resultados)]
+
+def mostrar_estadisticas():
+    """Muestra los totales del logbook leyendo las tablas de resumen"""
+    with conexion_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT qsos, indicativos FROM stats_totales WHERE id = 1')
+        total, indicativos = cursor.fetchone() or (0, 0)
+        # Con ORDER BY ... LIMIT 1 SQLite mezcla los índices de ts_epoch de cada archivo;
+        # MIN() y MAX() sobre la vista recorrerían todas las filas
+        cursor.execute(f'''
+            SELECT (SELECT ts_epoch FROM {VISTA_HISTORIAL} ORDER BY ts_epoch LIMIT 1),
+                   (SELECT ts_epoch FROM {VISTA_HISTORIAL} ORDER BY ts_epoch DESC LIMIT 1)
+        ''')
+        primero, ultimo = cursor.fetchone()
+        secciones = []
+        for titulo, sql in (
+            ("Por banda", 'SELECT band, qsos FROM stats_banda ORDER BY qsos DESC'),
+            ("Por modo", 'SELECT mode, qsos FROM stats_modo ORDER BY qsos DESC'),
+            ("Por banda y modo", "SELECT band || ' ' || mode, qsos FROM stats_banda_modo ORDER BY qsos DESC"),
+            ("Por año", 'SELECT anio, qsos FROM stats_anio ORDER BY anio')
+        ):
+            cursor.execute(sql)
+            secciones.append((titulo, cursor.fetchall()))
+        # Contacto más lejano de cada banda: una búsqueda en idx_logbook_banda_distancia
+        # por banda y archivo (distance_km va en el SELECT para que SQLite pueda mezclarlas)
+        odx = []
+        cursor.execute('SELECT band FROM stats_banda')
+        for (band,) in cursor.fetchall():
+            cursor.execute(f'''
+                SELECT band, contact_call, grid_locator, distance_km, timestamp FROM {VISTA_HISTORIAL}
+                WHERE band = ? AND distance_km IS NOT NULL
+                ORDER BY distance_km DESC LIMIT 1
+            ''', (band,))
+            odx.extend(cursor.fetchall())
+        odx.sort(key=lambda fila: fila[3], reverse=True)
+    
+    print(f"\n{GREEN}--- Estadísticas del logbook ---{RESET}")
+    print(f"Contactos: {total}")
+    print(f"Indicativos distintos: {indicativos}")
+    if total:
+        print(f"Primer contacto: {timestamp_de_epoch(primero)}")
+        print(f"Último contacto: {timestamp_de_epoch(ultimo)}")
+    
+    for titulo, filas in secciones:
+        if filas:
+            print(f"\n{MAGENTA}{titulo}:{RESET}")
+            for nombre, cantidad in filas:
+                print(f"  {nombre:<14} {cantidad}")
+    
+    if odx:
+        print(f"\n{MAGENTA}ODX por banda:{RESET}")
+        for band, contact_call, grid, distancia, timestamp in odx:
+            print(f"  {band:<14} {distancia:>8.0f} km  {contact_call:<12} {grid:<8} {timestamp}")
+
+def recalcular_estadisticas():
+    """Reconstruye las tablas de resumen desde cero"""
+    inicio = time.perf_counter()
+    with conexion_db() as conn:
+        reconstruir_estadisticas(conn.cursor(), VISTA_HISTORIAL)
+    print(f"Estadísticas reconstruidas en {time.perf_counter() - inicio:.2f} s")
+
+def menu_estadisticas():
+    """Muestra las estadísticas y ofrece reconstruirlas"""
+    mostrar_estadisticas()
+    if input("\n¿Reconstruir las estadísticas desde el log? (s/N): ").strip().lower() == 's':
+        recalcular_estadisticas()
+        mostrar_estadisticas()
+
+#### FUNCIONES ADIF ####
+def exportar_adif():
+    """Exporta el logbook en el formato elegido, comprimido si se indica"""
+    print("\n--- Exportar contactos ---")
+    formato = input(f"Formato ({', '.join(FORMATOS_EXPORTACION)}) [adif]: ").strip().lower() or 'adif'
+    if formato not in FORMATOS_EXPORTACION:
+        print(f"{RED}Formato desconocido: {formato}{RESET}")
+        return
+    compresion = input(f"Compresión ({', '.join(COMPRESIONES)} o vacío para ninguna): ").strip().lower() or None
+    if compresion and compresion not in COMPRESIONES:
+        print(f"{RED}Compresión desconocida: {compresion}{RESET}")
+        return
+    filtro = pedir_filtro()
+    if filtro is None:
+        return
+    filename = input("Nombre del archivo (sin extensión): ").strip() or "hamradio_logbook"
+    filename = nombre_exportacion(filename, formato, compresion)
+    
+    exportar_filtrado(filename, filtro, formato, compresion)
     
     print(f"\nLogbook exportado correctamente a {filename}")
+    imprimir_metricas()
 
 def exportar_hoy_adif():
-    """Exporta todas las entradas creadas hoy a un archivo ADIF"""
-    hoy = datetime.datetime.now().strftime('%Y-%m-%d')
+    """Exporta todas las entradas creadas hoy (día UTC, como created_at) a un archivo ADIF"""
+    ahora = datetime.datetime.now(timezone.utc)
+    hoy = ahora.strftime('%Y-%m-%d')
+    manana = (ahora + datetime.timedelta(days=1)).strftime('%Y-%m-%d')
     nombre_archivo = f"logbook_{hoy}.adi"
     
-    print(f"\n--- Exportando entradas de hoy ({hoy}) a {nombre_archivo} ---")
+    print(f"\n--- Exportando entradas de hoy ({hoy} UTC) a {nombre_archivo} ---")
     
-    with conexion_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM logbook 
-            WHERE date(created_at) = date('now')
-            ORDER BY created_at DESC
-        ''')
-        entries = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description]
+    sql, params = consulta_filtrada({'creado_desde': hoy, 'creado_hasta': manana}, orden='created_at DESC',
+                                    origen='logbook')
+    total = exportar_consulta(
+        nombre_archivo,
+        f"HamRadio Logbook Export - Entradas del {hoy}",
+        sql,
+        params,
+        omitir_si_vacio=True
+    )
     
-    if not entries:
+    if not total:
         print("No hay entradas creadas hoy para exportar.")
         return
     
-    with open(nombre_archivo, 'w', encoding='utf-8') as f:
-        # Cabecera ADIF
-        f.write(f"HamRadio Logbook Export - Entradas del {hoy}\n")
-        f.write("<ADIF_VER:5>3.1.0\n")
-        f.write("<PROGRAMID:11>HamLogbook\n")
-        f.write(f"<CREATED_TIMESTAMP:15>{datetime.datetime.now(timezone.utc).strftime('%Y%m%d %H%M%S')}\n")
-        f.write("<EOH>\n\n")
+    print(f"Se exportaron {total} entradas creadas hoy.")
+    print(f"Archivo generado: {nombre_archivo}")
+    imprimir_metricas()
+
+def exportar_nuevas_adif():
+    """Exporta las entradas añadidas desde la última exportación incremental a un destino"""
+    print("\n--- Exportación incremental a ADIF ---")
+    destino = input("Destino (p. ej. lotw, clublog, qrz) [general]: ").strip().lower() or "general"
+    exportar_incremental(destino)
+
+def exportar_incremental(destino, nombre_archivo=None, formato='adif', compresion=None):
+    """Exporta las filas con id posterior a la marca del destino y avanza la marca al terminar
+    
+    El archivo se escribe con otro nombre y se renombra al final; la marca solo avanza
+    después, así que una exportación interrumpida se repite entera en la siguiente ejecución.
+    Retorna las entradas exportadas.
+    """
+    with conexion_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT ultimo_id FROM export_watermark WHERE destino = ?', (destino,))
+        fila = cursor.fetchone()
+        desde_id = fila[0] if fila else 0
+        # Límite fijo de la exportación: lo que se inserte mientras tanto queda para la siguiente
+        # Incluye los archivos anuales: un año archivado puede tener filas aún sin exportar
+        cursor.execute(f'SELECT id, created_at FROM {VISTA_HISTORIAL} WHERE id > ? ORDER BY id DESC LIMIT 1', (desde_id,))
+        hasta_id, hasta_created_at = cursor.fetchone() or (None, None)
+    
+    if hasta_id is None:
+        print(f"No hay entradas nuevas para '{destino}' desde la última exportación.")
+        return 0
+    
+    if not nombre_archivo:
+        nombre_archivo = nombre_exportacion(
+            f"logbook_{destino}_{datetime.datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}", formato, compresion)
+    # El temporal no conserva la extensión, así que la compresión se decide con el nombre final
+    compresion = compresion or compresion_de_archivo(nombre_archivo)
+    temporal = nombre_archivo + '.tmp'
+    
+    sql, params = consulta_filtrada({'id_despues': desde_id, 'id_hasta': hasta_id}, orden='id')
+    total = exportar_consulta(
+        temporal,
+        f"HamRadio Logbook Export - Incremental {destino}",
+        sql,
+        params,
+        formato=formato,
+        compresion=compresion,
+        sincronizar=True
+    )
+    os.replace(temporal, nombre_archivo)
+    
+    with conexion_db() as conn:
+        conn.execute('''
+            INSERT OR REPLACE INTO export_watermark (destino, ultimo_id, ultimo_created_at, archivo, updated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (destino, hasta_id, hasta_created_at, nombre_archivo))
+    
+    print(f"Se exportaron {total} entradas nuevas para '{destino}' (IDs {desde_id + 1} a {hasta_id}).")
+    print(f"Archivo generado: {nombre_archivo}")
+    imprimir_metricas()
+    return total
+
+def exportar_filtrado(nombre_archivo, filtro=None, formato='adif', compresion=None):
+    """Exporta en orden cronológico los contactos que cumplen el filtro; retorna las entradas escritas"""
+    sql, params = consulta_filtrada(filtro, orden='ts_epoch')
+    return exportar_consulta(nombre_archivo, "HamRadio Logbook Export", sql, params,
+                             formato=formato, compresion=compresion)
+
+def exportar_consulta(nombre_archivo, titulo, sql, params=(), formato='adif', compresion=None,
+                      omitir_si_vacio=False, sincronizar=False):
+    """Exporta el resultado de una consulta leyéndolo por lotes; retorna las entradas escritas
+    
+    'formato' es una clave de FORMATOS_EXPORTACION. La compresión ('gz', 'bz2' o 'xz') se
+    aplica al escribir, en la misma pasada; si no se indica, se deduce de la extensión del
+    archivo. Con 'sincronizar' el archivo se fuerza a disco antes de cerrarlo.
+    """
+    if compresion is None:
+        compresion = compresion_de_archivo(nombre_archivo)
+    preparar = FORMATOS_EXPORTACION[formato][1]
+    
+    reiniciar_metricas()
+    reloj = time.perf_counter
+    consulta = codificacion = escritura = 0.0
+    
+    with conexion_db() as conn:
+        marca = reloj()
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        cabecera, codificar_lote, pie = preparar([desc[0] for desc in cursor.description], titulo)
         
-        for entry in entries:
-            for col, val in zip(columns, entry):
-                if col == 'id' or val is None or val == '':
-                    continue
-                
-                tag = mapear_tag_adif(col)
-                if not tag:
-                    continue
-                
-                if col == 'timestamp':
-                    dt = datetime.datetime.strptime(val, '%Y-%m-%d %H:%M:%S')
-                    f.write(f"<{tag}:8>{dt.strftime('%Y%m%d')} <TIME_ON:6>{dt.strftime('%H%M%S')} ")
-                elif col == 'frequency':
-                    f.write(f"<{tag}:8>{val:.6f} ")
-                else:
-                    val_str = str(val)
-                    f.write(f"<{tag}:{len(val_str)}>{val_str} ")
+        filas = cursor.fetchmany(TAM_LOTE_EXPORTACION)
+        consulta += reloj() - marca
+        if not filas and omitir_si_vacio:
+            return 0
+        
+        total = 0
+        with abrir_exportacion(nombre_archivo, compresion, sincronizar) as f:
+            f.write(cabecera)
+            
+            while filas:
+                marca = reloj()
+                lineas = codificar_lote(filas)
+                ahora = reloj()
+                codificacion += ahora - marca
+                f.writelines(lineas)
+                marca = reloj()
+                escritura += marca - ahora
+                total += len(filas)
+                filas = cursor.fetchmany(TAM_LOTE_EXPORTACION)
+                consulta += reloj() - marca
             
-            f.write("<EOR>\n")
+            marca = reloj()
+            f.write(pie)
+        escritura += reloj() - marca
     
-    print(f"Se exportaron {len(entries)} entradas creadas hoy.")
-    print(f"Archivo generado: {nombre_archivo}")    
+    sumar_metrica('consulta', consulta, total)
+    sumar_metrica(f'codificacion_{formato}', codificacion, total)
+    sumar_metrica('escritura', escritura, total)
+    return total
+
+def cabecera_adif(titulo):
+    """Retorna la cabecera de un archivo ADIF"""
+    return (
+        f"{titulo}\n"
+        "<ADIF_VER:5>3.1.0\n"
+        "<PROGRAMID:11>HamLogbook\n"
+        f"<CREATED_TIMESTAMP:15>{datetime.datetime.now(timezone.utc).strftime('%Y%m%d %H%M%S')}\n"
+        "<EOH>\n\n"
+    )
+
+def preparar_codificadores_adif(columnas):
+    """Retorna (índice, tag, codificador) de cada columna exportable de una consulta"""
+    codificadores = []
+    for indice, col in enumerate(columnas):
+        tag = mapear_tag_adif(col)
+        if col == 'id' or not tag:
+            continue
+        codificadores.append((indice, tag, CODIFICADORES_ADIF.get(col, codificar_campo_adif)))
+    return codificadores
+
+def codificar_registro_adif(entry, codificadores):
+    """Codifica una fila como un registro ADIF completo"""
+    partes = [
+        codificar(tag, entry[indice])
+        for indice, tag, codificar in codificadores
+        if entry[indice] is not None and entry[indice] != ''
+    ]
+    partes.append("<EOR>\n")
+    return ''.join(partes)
+
+def codificar_campo_adif(tag, val):
+    """Codifica un valor genérico como campo ADIF; la longitud se da en bytes UTF-8, como la lee la importación"""
+    val_str = str(val)
+    longitud = len(val_str) if val_str.isascii() else len(val_str.encode('utf-8'))
+    return f"<{tag}:{longitud}>{val_str} "
+
+def codificar_frecuencia_adif(tag, val):
+    """Codifica la frecuencia en MHz con 6 decimales"""
+    val_str = f"{val:.6f}"
+    return f"<{tag}:{len(val_str)}>{val_str} "
+
+def codificar_timestamp_adif(tag, val):
+    """Codifica 'YYYY-MM-DD HH:MM:SS' como QSO_DATE y TIME_ON sin pasar por datetime"""
+    return f"<{tag}:8>{val[0:4]}{val[5:7]}{val[8:10]} <TIME_ON:6>{val[11:13]}{val[14:16]}{val[17:19]} "
+
+CODIFICADORES_ADIF = {
+    'timestamp': codificar_timestamp_adif,
+    'frequency': codificar_frecuencia_adif
+}
+
+TAGS_ADIF = {
+    'my_call': 'OPERATOR',
+    'contact_call': 'CALL',
+    'frequency': 'FREQ',
+    'band': 'BAND',
+    'mode': 'MODE',
+    'timestamp': 'QSO_DATE',
+    'rst_sent': 'RST_SENT',
+    'rst_received': 'RST_RCVD',
+    'comment': 'COMMENT',
+    'qth': 'QTH',
+    'name': 'NAME',
+    'power': 'TX_PWR',
+    'grid_locator': 'GRIDSQUARE',
+    'distance_km': 'DISTANCE'
+}
 
 def mapear_tag_adif(col):
     """Mapea nombres de columnas a tags ADIF"""
-    tag_map = {
-        'my_call': 'OPERATOR',
-        'contact_call': 'CALL',
-        'frequency': 'FREQ',
-        'band': 'BAND',
-        'mode': 'MODE',
-        'timestamp': 'QSO_DATE',
-        'rst_sent': 'RST_SENT',
-        'rst_received': 'RST_RCVD',
-        'comment': 'COMMENT',
-        'qth': 'QTH',
-        'name': 'NAME',
-        'power': 'TX_PWR',
-        'grid_locator': 'GRIDSQUARE'
-    }
-    return tag_map.get(col)
+    return TAGS_ADIF.get(col)
 
 def importar_adif():
-    """Importa entradas desde un archivo ADIF"""
+    """Importa entradas desde uno o varios archivos ADIF (admite comodines, p. ej. *.adi)"""
     print("\n--- Importar desde ADIF ---")
-    filename = input("Nombre del archivo ADIF (con extensión): ").strip()
+    filename = input("Nombre del archivo ADIF (con extensión o patrón; admite .gz, .bz2, .xz y .zip): ").strip()
     
-    if not os.path.exists(filename):
+    archivos = sorted(glob.glob(filename)) if glob.has_magic(filename) else [filename]
+    if len(archivos) > 1:
+        importar_archivos_adif(archivos)
+    elif archivos:
+        importar_archivo_adif(archivos[0])
+    else:
+        print("[ERROR] Ningún archivo coincide con el patrón.")
+
+def importar_archivo_adif(filename):
+    """Importa un archivo ADIF, comprimido o .zip ('-' para la entrada estándar) sin interacción
+    
+    Retorna los contadores o None si falla.
+    """
+    if filename != ENTRADA_ESTANDAR and not os.path.exists(filename):
         print("[ERROR] El archivo no existe.")
-        return
+        return None
         
     print(f"\nProcesando archivo: {filename}")
+    reiniciar_metricas()
     
     try:
-        with open(filename, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-
-        content = preprocesar_adif(content)
-        registros = procesar_contenido_adif(content)
-        
-        if registros['entries']:
-            importar_registros_adif(registros)
-        else:
-            print("\nNo se encontraron registros válidos para importar")
+        # Los contactos pasan del archivo a la base por lotes, sin acumular el archivo entero;
+        # en memoria solo quedan las claves del archivo para sus propios duplicados
+        registros = {'record_count': 0, 'imported_count': 0, 'skipped_count': 0}
+        qsos = procesar_contenido_adif(leer_campos_origen_adif(filename, CAMPOS_ADIF_IMPORTADOS),
+                                       cargar_configuracion(), registros, set())
+        importar_registros_adif(qsos, registros)
+        imprimir_metricas()
+        return registros
             
     except Exception as e:
         print(f"\n[ERROR] Falla en la importación: {str(e)}")
+        return None
+
+def importar_archivos_adif(archivos, procesos=None):
+    """Importa varios archivos ADIF analizándolos en paralelo y escribiendo desde un único proceso
+    
+    Cada proceso auxiliar envía sus contactos por lotes a una cola acotada propia y el
+    escritor vacía las colas en el orden de los archivos, así que en memoria solo hay a
+    la vez unos pocos lotes por proceso. Retorna los contadores de cada archivo, con
+    None en los que fallaron.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    
+    reiniciar_metricas()
+    config = cargar_configuracion()
+    resultados = []
+    total = {'record_count': 0, 'imported_count': 0, 'skipped_count': 0}
+    
+    with multiprocessing.Manager() as gestor, ProcessPoolExecutor(max_workers=procesos) as pool:
+        colas = [gestor.Queue(LOTES_EN_COLA_IMPORTACION) for _ in archivos]
+        # Los procesos toman los archivos en orden, así que el que escribe el escritor ya
+        # tiene proceso; los duplicados entre archivos se resuelven siempre igual
+        futuros = [pool.submit(analizar_archivo_adif, filename, config, cola) for filename, cola in zip(archivos, colas)]
+        for filename, cola, futuro in zip(archivos, colas, futuros):
+            print(f"\nProcesando archivo: {filename}")
+            registros = {'record_count': 0, 'imported_count': 0, 'skipped_count': 0}
+            try:
+                # Un error de análisis a mitad de archivo deshace lo ya insertado de ese archivo
+                importar_registros_adif(recibir_lotes_analizados(cola, futuro, registros), registros)
+            except Exception as e:
+                print(f"[ERROR] {e}")
+                # El proceso auxiliar puede estar esperando en la cola acotada: hay que vaciarla
+                # hasta que termine o el pool no se cerraría nunca
+                vaciar_cola_analisis(cola, futuro)
+                resultados.append(None)
+                continue
+            
+            for contador in total:
+                total[contador] += registros[contador]
+            resultados.append(registros)
+    
+    print(f"\n{GREEN}Resumen de {len(archivos)} archivos:{RESET}")
+    print(f"- Archivos con errores: {resultados.count(None)}")
+    print(f"- Total registros en archivos: {total['record_count']}")
+    print(f"- Registros nuevos importados: {total['imported_count']}")
+    print(f"- Registros duplicados omitidos: {total['skipped_count']}")
+    print(f"- Registros con errores: {total['record_count'] - total['imported_count'] - total['skipped_count']}")
+    # Las etapas de análisis suman el tiempo de todos los procesos auxiliares
+    imprimir_metricas()
+    return resultados
+
+def recibir_lotes_analizados(cola, futuro, registros):
+    """Genera los (número de registro, QSO) que un proceso auxiliar envía a 'cola' y completa 'registros' al terminar
+    
+    Lanza RuntimeError si el análisis del archivo falló.
+    """
+    import queue
+    
+    while True:
+        try:
+            mensaje = cola.get(timeout=1)
+        except queue.Empty:
+            # Si el proceso terminó sin enviar el resumen, futuro.result() lanza su excepción
+            if futuro.done():
+                futuro.result()
+                raise RuntimeError("El proceso de análisis terminó sin resultado")
+            continue
+        
+        if isinstance(mensaje, dict):
+            print(mensaje['salida'], end='')
+            incorporar_metricas(mensaje['metricas'])
+            if mensaje['error']:
+                raise RuntimeError(mensaje['error'])
+            registros['record_count'] += mensaje['record_count']
+            registros['skipped_count'] += mensaje['skipped_count']
+            return
+        
+        lote, salida = mensaje
+        print(salida, end='')
+        yield from lote
+
+def vaciar_cola_analisis(cola, futuro):
+    """Descarta lo que un proceso auxiliar siga enviando a 'cola' hasta que termine"""
+    import queue
+    
+    while not futuro.done():
+        try:
+            cola.get(timeout=1)
+        except queue.Empty:
+            pass
+
+def analizar_archivo_adif(filename, config, cola):
+    """Analiza un archivo ADIF en un proceso auxiliar, sin tocar la base de datos
+    
+    Envía a 'cola' lotes de (número de registro, QSO), sin los repetidos dentro del
+    archivo, junto con los mensajes capturados mientras se analizaban y, al final, un
+    diccionario con los contadores, las métricas y el error, si lo hubo. La cola está
+    acotada: si el escritor va por detrás, espera.
+    """
+    import io
+    
+    salida = io.StringIO()
+    registros = {'record_count': 0, 'imported_count': 0, 'skipped_count': 0, 'error': None}
+    reiniciar_metricas()
+    with contextlib.redirect_stdout(salida):
+        try:
+            qsos = procesar_contenido_adif(leer_campos_origen_adif(filename, CAMPOS_ADIF_IMPORTADOS), config, registros, set())
+            while True:
+                lote = list(islice(qsos, TAM_LOTE_IMPORTACION))
+                if not lote:
+                    break
+                cola.put((lote, salida.getvalue()))
+                salida.seek(0)
+                salida.truncate()
+        except Exception as e:
+            registros['error'] = f"Falla en la importación: {str(e)}"
+    registros['salida'] = salida.getvalue()
+    registros['metricas'] = obtener_metricas()
+    cola.put(registros)
+
+#### FORMATOS DE EXPORTACIÓN ####
+# Modos de Cabrillo; el resto de modos digitales se exporta como DG
+MODOS_CABRILLO = {'CW': 'CW', 'SSB': 'PH', 'USB': 'PH', 'LSB': 'PH', 'AM': 'PH', 'FM': 'FM', 'RTTY': 'RY'}
+# Designadores de Cabrillo por encima de HF: (MHz desde, MHz hasta, designador)
+BANDAS_CABRILLO = [
+    (50, 54, '50'), (70, 71, '70'), (144, 148, '144'), (219, 225, '222'), (420, 450, '432'),
+    (902, 928, '902'), (1240, 1300, '1.2G'), (2300, 2450, '2.3G'), (3300, 3500, '3.4G'),
+    (5650, 5925, '5.7G'), (10000, 10500, '10G'), (24000, 24250, '24G'), (47000, 47200, '47G'),
+    (75500, 81000, '75G')
+]
+
+def nombre_exportacion(base, formato, compresion=None):
+    """Añade a 'base' la extensión del formato y, si la hay, la de la compresión"""
+    return base + FORMATOS_EXPORTACION[formato][0] + (COMPRESIONES[compresion] if compresion else '')
+
+def compresion_de_archivo(nombre_archivo):
+    """Deduce la compresión de la extensión del archivo, o None si no está comprimido"""
+    for compresion, extension in COMPRESIONES.items():
+        if nombre_archivo.lower().endswith(extension):
+            return compresion
+    return None
+
+@contextlib.contextmanager
+def abrir_exportacion(nombre_archivo, compresion=None, sincronizar=False):
+    """Abre el archivo de exportación como texto UTF-8, comprimiéndolo al escribir si se indica"""
+    import io
+    
+    with open(nombre_archivo, 'wb', buffering=TAM_BUFFER_ESCRITURA) as crudo:
+        if compresion == 'gz':
+            import gzip
+            comprimido = gzip.GzipFile(fileobj=crudo, mode='wb', compresslevel=NIVEL_GZIP)
+        elif compresion == 'bz2':
+            import bz2
+            comprimido = bz2.BZ2File(crudo, 'wb')
+        elif compresion == 'xz':
+            import lzma
+            comprimido = lzma.LZMAFile(crudo, 'wb')
+        elif compresion:
+            raise ValueError(f"Compresión desconocida: {compresion}")
+        else:
+            comprimido = crudo
+        
+        f = io.TextIOWrapper(comprimido, encoding='utf-8')
+        yield f
+        f.flush()
+        f.detach()
+        if comprimido is not crudo:
+            # Cierra el flujo comprimido (escribe su final) sin cerrar el archivo subyacente
+            comprimido.close()
+        if sincronizar:
+            crudo.flush()
+            os.fsync(crudo.fileno())
+
+def preparar_exportacion_adif(columnas, titulo):
+    """Retorna cabecera, codificador de lotes y pie de un archivo ADIF"""
+    codificadores = preparar_codificadores_adif(columnas)
+    
+    def codificar_lote(filas):
+        return [codificar_registro_adif(entry, codificadores) for entry in filas]
+    return cabecera_adif(titulo), codificar_lote, ''
+
+def preparar_exportacion_adx(columnas, titulo):
+    """Retorna cabecera, codificador de lotes y pie de un archivo ADX (ADIF en XML)"""
+    from xml.sax.saxutils import escape
+    
+    campos = [(indice, columnas[indice], tag) for indice, tag, _ in preparar_codificadores_adif(columnas)]
+    
+    def codificar_registro(entry):
+        partes = ['<RECORD>']
+        for indice, col, tag in campos:
+            val = entry[indice]
+            if val is None or val == '':
+                continue
+            if col == 'timestamp':
+                partes.append(f"<QSO_DATE>{val[0:4]}{val[5:7]}{val[8:10]}</QSO_DATE>"
+                              f"<TIME_ON>{val[11:13]}{val[14:16]}{val[17:19]}</TIME_ON>")
+            elif col == 'frequency':
+                partes.append(f"<{tag}>{val:.6f}</{tag}>")
+            else:
+                partes.append(f"<{tag}>{escape(str(val))}</{tag}>")
+        partes.append('</RECORD>\n')
+        return ''.join(partes)
+    
+    def codificar_lote(filas):
+        return [codificar_registro(entry) for entry in filas]
+    
+    cabecera = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<ADX>\n'
+        '<HEADER>\n'
+        '<ADIF_VER>3.1.0</ADIF_VER>\n'
+        '<PROGRAMID>HamLogbook</PROGRAMID>\n'
+        f"<CREATED_TIMESTAMP>{datetime.datetime.now(timezone.utc).strftime('%Y%m%d %H%M%S')}</CREATED_TIMESTAMP>\n"
+        '</HEADER>\n'
+        '<RECORDS>\n'
+    )
+    return cabecera, codificar_lote, '</RECORDS>\n</ADX>\n'
+
+def frecuencia_cabrillo(frecuencia, banda):
+    """Retorna la frecuencia en kHz (HF) o el designador de banda (VHF y superiores) de Cabrillo"""
+    if frecuencia is None and banda in _plan_activo['bandas']:
+        # Sin frecuencia se usa el inicio de la banda según el plan activo
+        frecuencia = _plan_activo['inicios'][_plan_activo['bandas'].index(banda)]
+    if frecuencia is None:
+        return ''
+    if frecuencia < 30:
+        return str(round(frecuencia * 1000))
+    for desde, hasta, designador in BANDAS_CABRILLO:
+        if desde <= frecuencia <= hasta:
+            return designador
+    return f"{frecuencia:g}"
+
+def preparar_exportacion_cabrillo(columnas, titulo):
+    """Retorna cabecera, codificador de lotes y pie de un log Cabrillo 3.0
+    
+    El intercambio de cada QSO es solo el RST, que es lo que guarda el logbook.
+    """
+    i = {col: indice for indice, col in enumerate(columnas)}
+    config = cargar_configuracion()
+    
+    def codificar_qso(entry):
+        modo = (entry[i['mode']] or '').upper()
+        modo_cabrillo = MODOS_CABRILLO.get(modo, 'DG')
+        reporte = '599' if modo_cabrillo in ('CW', 'RY') else '59'
+        ts = entry[i['timestamp']]
+        linea = (
+            f"QSO: {frecuencia_cabrillo(entry[i['frequency']], entry[i['band']]):>5} {modo_cabrillo} "
+            f"{ts[0:10]} {ts[11:13]}{ts[14:16]} "
+            f"{entry[i['my_call']] or config['my_call']:<13} {entry[i['rst_sent']] or reporte:<3} "
+            f"{entry[i['contact_call']]:<13} {entry[i['rst_received']] or reporte:<3}"
+        )
+        return linea.rstrip() + '\n'
+    
+    def codificar_lote(filas):
+        return [codificar_qso(entry) for entry in filas]
+    
+    cabecera = "START-OF-LOG: 3.0\nCREATED-BY: HamLogbook\n"
+    if config['my_call']:
+        cabecera += f"CALLSIGN: {config['my_call']}\n"
+    if config['grid_locator']:
+        cabecera += f"GRID-LOCATOR: {config['grid_locator']}\n"
+    cabecera += f"SOAPBOX: {titulo}\n"
+    return cabecera, codificar_lote, "END-OF-LOG:\n"
+
+def preparar_exportacion_csv(columnas, titulo):
+    """Retorna cabecera, codificador de lotes y pie de un CSV con una columna por campo de la tabla"""
+    import csv
+    import io
+    
+    def codificar_lote(filas):
+        # Un solo writerows por lote en lugar de una llamada por fila
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\n').writerows(filas)
+        return [buffer.getvalue()]
+    return ','.join(columnas) + '\n', codificar_lote, ''
+
+def preparar_exportacion_jsonl(columnas, titulo):
+    """Retorna cabecera, codificador de lotes y pie de un JSON Lines con un objeto por contacto"""
+    import json
+    
+    codificar = json.JSONEncoder(ensure_ascii=False).encode
+    
+    def codificar_lote(filas):
+        return [codificar(dict(zip(columnas, entry))) + '\n' for entry in filas]
+    return '', codificar_lote, ''
+
+# Extensión y constructor de cada formato: constructor(columnas, titulo) -> (cabecera, codificar_lote, pie)
+FORMATOS_EXPORTACION = {
+    'adif': ('.adi', preparar_exportacion_adif),
+    'adx': ('.adx', preparar_exportacion_adx),
+    'cabrillo': ('.log', preparar_exportacion_cabrillo),
+    'csv': ('.csv', preparar_exportacion_csv),
+    'jsonl': ('.jsonl', preparar_exportacion_jsonl)
+}
+
+#### SERVICIO UDP ####
+WSJTX_MAGIC = 0xADBCCBDA
+WSJTX_QSO_LOGGED = 5
+WSJTX_LOGGED_ADIF = 12
+MODOS_N1MM = {'USB': 'SSB', 'LSB': 'SSB'}
+
+def servir_udp(puertos, captura=None, duracion=None, host=HOST_UDP):
+    """Recibe contactos de WSJT-X y N1MM por UDP y los guarda por lotes hasta Ctrl+C"""
+    import asyncio
+    
+    try:
+        asyncio.run(servicio_udp(puertos, captura, duracion, host))
+    except KeyboardInterrupt:
+        pass
+
+async def servicio_udp(puertos, captura=None, duracion=None, host=HOST_UDP):
+    """Escucha en 'puertos' de 'host' y escribe los contactos recibidos desde una única tarea"""
+    import asyncio
+    import socket
+    from concurrent.futures import ThreadPoolExecutor
+    
+    loop = asyncio.get_running_loop()
+    cola = asyncio.Queue(maxsize=TAM_COLA_UDP)
+    estado = {'datagramas': 0, 'descartados': 0, 'invalidos': 0, 'guardados': 0, 'duplicados': 0}
+    reiniciar_metricas()
+    archivo_captura = open(captura, 'ab') if captura else None
+    
+    class ProtocoloUDP(asyncio.DatagramProtocol):
+        def datagram_received(self, datos, direccion):
+            recibir_datagrama_udp(datos, cola, estado, archivo_captura)
+    
+    transportes = []
+    for puerto in puertos:
+        transporte, _ = await loop.create_datagram_endpoint(ProtocoloUDP, local_addr=(host, puerto))
+        # El sistema puede limitar el tamaño; si no lo admite se queda con el predeterminado
+        try:
+            transporte.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, TAM_BUFFER_UDP)
+        except OSError:
+            pass
+        transportes.append(transporte)
+    print(f"{GREEN}Escuchando contactos UDP en {host}, puertos {', '.join(map(str, puertos))}{RESET} (Ctrl+C para terminar)")
+    
+    # La base se escribe desde un único hilo, con su propia conexión, sin bloquear la recepción
+    escritor = ThreadPoolExecutor(max_workers=1)
+    config = cargar_configuracion()
+    tarea = asyncio.ensure_future(escribir_lotes_udp(cola, config, estado, escritor))
+    
+    try:
+        await asyncio.sleep(duracion if duracion is not None else float('inf'))
+    except asyncio.CancelledError:
+        pass
+    finally:
+        for transporte in transportes:
+            transporte.close()
+        # Lo que quede en la cola se escribe antes de salir
+        await cola.put(None)
+        await tarea
+        await loop.run_in_executor(escritor, cerrar_conexiones)
+        escritor.shutdown()
+        if archivo_captura:
+            archivo_captura.close()
+        print(f"\nDatagramas recibidos: {estado['datagramas']} "
+              f"(descartados por cola llena: {estado['descartados']}, no válidos: {estado['invalidos']})")
+        print(f"Contactos guardados: {estado['guardados']}, duplicados: {estado['duplicados']}")
+        imprimir_metricas()
+
+def recibir_datagrama_udp(datos, cola, estado, archivo_captura=None):
+    """Decodifica un datagrama y encola sus contactos sin esperar a la base de datos"""
+    import asyncio
+    
+    estado['datagramas'] += 1
+    if archivo_captura:
+        archivo_captura.write(struct.pack('>dI', time.time(), len(datos)) + datos)
+    
+    try:
+        contactos = decodificar_datagrama(datos)
+    except (ValueError, struct.error) as e:
+        estado['invalidos'] += 1
+        print(f"[WARN] Datagrama no válido: {e}")
+        return
+    
+    for fields in contactos:
+        try:
+            cola.put_nowait(fields)
+        except asyncio.QueueFull:
+            # UDP no admite contrapresión: si el escritor no da abasto se pierde el contacto
+            estado['descartados'] += 1
+            if estado['descartados'] % 100 == 1:
+                print(f"{RED}[WARN] Cola llena, contactos descartados: {estado['descartados']}{RESET}")
+
+async def escribir_lotes_udp(cola, config, estado, escritor):
+    """Agrupa los contactos de la cola y los guarda cada INTERVALO_LOTE_UDP segundos o TAM_LOTE_UDP contactos"""
+    import asyncio
+    
+    loop = asyncio.get_running_loop()
+    terminar = False
+    while not terminar:
+        fields = await cola.get()
+        if fields is None:
+            return
+        lote = [fields]
+        limite = loop.time() + INTERVALO_LOTE_UDP
+        
+        while len(lote) < TAM_LOTE_UDP:
+            restante = limite - loop.time()
+            if restante <= 0:
+                break
+            try:
+                fields = await asyncio.wait_for(cola.get(), restante)
+            except asyncio.TimeoutError:
+                break
+            if fields is None:
+                terminar = True
+                break
+            lote.append(fields)
+        
+        await loop.run_in_executor(escritor, guardar_lote_udp, lote, config, estado)
+
+def guardar_lote_udp(lote, config, estado):
+    """Valida un lote de contactos recibidos y guarda los nuevos en una transacción"""
+    registros = {'record_count': len(lote), 'imported_count': 0, 'skipped_count': 0}
+    qsos = []
+    vistos = set()
+    duplicados = 0
+    
+    for numero, fields in enumerate(lote, 1):
+        if not validar_campos_obligatorios(fields, numero):
+            continue
+        try:
+            qso = procesar_registro_adif(fields, numero, config)
+        except ValueError as e:
+            print(f"[WARN] Contacto no válido: {e}")
+            continue
+        if qso is None:
+            continue
+        
+        # WSJT-X envía cada contacto dos veces (QSO Logged y Logged ADIF); si las dos llegan
+        # en el mismo lote, la segunda se descarta aquí y, si no, al consultar la base
+        clave = (qso.contact_call, qso.ts_epoch)
+        if clave in vistos:
+            duplicados += 1
+            continue
+        vistos.add(clave)
+        qsos.append((numero, qso))
+    
+    if qsos:
+        try:
+            importar_registros_adif(qsos, registros, informar=False)
+        except sqlite3.Error as e:
+            print(f"[ERROR] SQLite: {str(e)}")
+    
+    estado['guardados'] += registros['imported_count']
+    estado['duplicados'] += duplicados + registros['skipped_count']
+    if registros['imported_count']:
+        print(f"[INFO] {registros['imported_count']} contactos guardados "
+              f"({', '.join(qso.contact_call for _, qso in qsos[:5])}"
+              f"{'...' if len(qsos) > 5 else ''})")
+
+def decodificar_datagrama(datos):
+    """Retorna los campos ADIF de los contactos de un datagrama de WSJT-X o N1MM"""
+    if len(datos) >= 4 and struct.unpack_from('>I', datos)[0] == WSJTX_MAGIC:
+        return decodificar_wsjtx(datos)
+    if b'<contactinfo' in datos[:256]:
+        return decodificar_n1mm(datos)
+    # Otros mensajes (estado, decodificaciones, latidos...) no contienen contactos
+    return []
+
+def decodificar_wsjtx(datos):
+    """Decodifica los mensajes 'QSO Logged' y 'Logged ADIF' del protocolo de WSJT-X"""
+    _, _, tipo = struct.unpack_from('>III', datos)
+    pos = 12
+    _, pos = leer_utf8_qt(datos, pos)  # Id del cliente
+    
+    if tipo == WSJTX_LOGGED_ADIF:
+        adif, pos = leer_utf8_qt(datos, pos)
+        return list(extraer_campos_adif_bytes(adif.encode('utf-8'), CAMPOS_ADIF_IMPORTADOS))
+    if tipo != WSJTX_QSO_LOGGED:
+        return []
+    
+    _, pos = leer_fecha_qt(datos, pos)  # Fin del contacto
+    call, pos = leer_utf8_qt(datos, pos)
+    grid, pos = leer_utf8_qt(datos, pos)
+    (frecuencia_hz,) = struct.unpack_from('>Q', datos, pos)
+    pos += 8
+    mode, pos = leer_utf8_qt(datos, pos)
+    rst_sent, pos = leer_utf8_qt(datos, pos)
+    rst_rcvd, pos = leer_utf8_qt(datos, pos)
+    power, pos = leer_utf8_qt(datos, pos)
+    comment, pos = leer_utf8_qt(datos, pos)
+    name, pos = leer_utf8_qt(datos, pos)
+    inicio, pos = leer_fecha_qt(datos, pos)
+    
+    fields = {
+        'CALL': call,
+        'GRIDSQUARE': grid,
+        'MODE': mode,
+        'RST_SENT': rst_sent,
+        'RST_RCVD': rst_rcvd,
+        'COMMENT': comment,
+        'NAME': name,
+        'QSO_DATE': inicio.strftime('%Y%m%d'),
+        'TIME_ON': inicio.strftime('%H%M%S')
+    }
+    if frecuencia_hz:
+        fields['FREQ'] = f"{frecuencia_hz / 1e6:.6f}"
+        fields['BAND'] = determinar_banda(frecuencia_hz / 1e6)
+    if RE_NUMERO.match(power):
+        fields['TX_PWR'] = power
+    return [fields]
+
+def leer_utf8_qt(datos, pos):
+    """Lee una cadena UTF-8 serializada por Qt (longitud de 32 bits y bytes)"""
+    (longitud,) = struct.unpack_from('>I', datos, pos)
+    pos += 4
+    if longitud == 0xFFFFFFFF:  # Cadena nula
+        return '', pos
+    if pos + longitud > len(datos):
+        raise ValueError("cadena truncada")
+    return bytes(datos[pos:pos + longitud]).decode('utf-8', 'replace'), pos + longitud
+
+def leer_fecha_qt(datos, pos):
+    """Lee un QDateTime serializado por Qt y lo retorna en UTC"""
+    dia_juliano, milisegundos, especificacion = struct.unpack_from('>qIB', datos, pos)
+    pos += 13
+    fecha = datetime.datetime.fromordinal(dia_juliano - 1721425) + datetime.timedelta(milliseconds=milisegundos)
+    if especificacion == 2:  # Desfase respecto a UTC en segundos
+        (desfase,) = struct.unpack_from('>i', datos, pos)
+        pos += 4
+        fecha -= datetime.timedelta(seconds=desfase)
+    elif especificacion == 3:  # Zona horaria por nombre; se toma la hora tal cual
+        _, pos = leer_utf8_qt(datos, pos)
+    return fecha, pos
+
+def decodificar_n1mm(datos):
+    """Decodifica un paquete 'contactinfo' de N1MM Logger+"""
+    import xml.etree.ElementTree as ET
+    
+    try:
+        raiz = ET.fromstring(datos)
+    except ET.ParseError as e:
+        raise ValueError(f"XML de N1MM no válido: {e}")
+    if raiz.tag != 'contactinfo':
+        return []
+    
+    valor = lambda nombre: (raiz.findtext(nombre) or '').strip()
+    momento = datetime.datetime.strptime(valor('timestamp'), '%Y-%m-%d %H:%M:%S')
+    mode = valor('mode').upper()
+    fields = {
+        'CALL': valor('call'),
+        'MODE': MODOS_N1MM.get(mode, mode),
+        'QSO_DATE': momento.strftime('%Y%m%d'),
+        'TIME_ON': momento.strftime('%H%M%S'),
+        'RST_SENT': valor('snt'),
+        'RST_RCVD': valor('rcv'),
+        'GRIDSQUARE': valor('gridsquare'),
+        'NAME': valor('name'),
+        'COMMENT': valor('comment')
+    }
+    # N1MM expresa la frecuencia en decenas de Hz
+    frecuencia = valor('txfreq') or valor('rxfreq')
+    if frecuencia.isdigit() and int(frecuencia):
+        fields['FREQ'] = f"{int(frecuencia) / 1e5:.6f}"
+        fields['BAND'] = determinar_banda(int(frecuencia) / 1e5)
+    if RE_NUMERO.match(valor('power')):
+        fields['TX_PWR'] = valor('power')
+    return [fields]
 
 #### FUNCIONES AUXILIARES ####
 def determinar_banda(frecuencia):
     """Determina la banda basada en la frecuencia en MHz"""
-    band_plan = {
-        '160m': (1.8, 2.0),
-        '80m': (3.5, 3.8),    
-        '60m': (5.3515, 5.3665),
-        '40m': (7.0, 7.3),
-        '30m': (10.1, 10.15),
-        '20m': (14.0, 14.35),  
-        '17m': (18.068, 18.168),
-        '15m': (21.0, 21.45),  
-        '12m': (24.89, 24.99),
-        '10m': (28.0, 29.7),   
-        '6m': (50.0, 54.0),
-        '2m': (144.0, 148.0),
-        '1,2m': (220.0, 225.0),
-        '70cm': (430.0, 440.0), 
-        '23cm': (1240.0, 1300.0),
-        '13cm': (2390.0, 2450.0),
-        '9cm': (3300.0, 3400.0),
-        '5cm': (5650.0, 5850.0),
-        '3cm': (10000.0, 10500.0),
-        '1,2cm': (24000.0, 24250.0),
-        '6mm': (47000.0, 47200.0),
-    }
-    for banda, (low, high) in band_plan.items():
-        if low <= frecuencia <= high:
-            return banda
+    i = bisect_right(_plan_activo['inicios'], frecuencia) - 1
+    if i >= 0 and frecuencia <= _plan_activo['finales'][i]:
+        return _plan_activo['bandas'][i]
     return f"{frecuencia:.3f}MHz"
 
+def determinar_bandas(frecuencias):
+    """Determina la banda de una secuencia de frecuencias en MHz en una sola llamada"""
+    inicios = _plan_activo['inicios']
+    finales = _plan_activo['finales']
+    bandas = _plan_activo['bandas']
+    resultado = []
+    for frecuencia in frecuencias:
+        i = bisect_right(inicios, frecuencia) - 1
+        if i >= 0 and frecuencia <= finales[i]:
+            resultado.append(bandas[i])
+        else:
+            resultado.append(f"{frecuencia:.3f}MHz")
+    return resultado
+
+def cargar_plan_bandas(region):
+    """Activa el plan de bandas de una región IARU como tabla ordenada de intervalos"""
+    tabla = sorted(PLANES_BANDA[region])
+    _plan_activo['region'] = region
+    _plan_activo['inicios'] = [inicio for inicio, _, _ in tabla]
+    _plan_activo['finales'] = [final for _, final, _ in tabla]
+    _plan_activo['bandas'] = [banda for _, _, banda in tabla]
+
+cargar_plan_bandas(REGION_IARU_PREDETERMINADA)
+
 def obtener_timestamp():
     """Obtiene la fecha y hora del contacto"""
     while True:
@@ -487,86 +2653,172 @@ def obtener_frecuencia_valida():
         except ValueError:
             print("Por favor, introduce un número válido.")
 
-def preprocesar_adif(content):
-    """Preprocesa el contenido ADIF para estandarizarlo"""
-    return content.replace('<QSO_DATE:8:D>', '<QSO_DATE:8>').replace('<TIME_ON:6:T>', '<TIME_ON:6>')
-
-def procesar_contenido_adif(content):
-    """Procesa el contenido ADIF y extrae los registros"""
-    eoh_pos = content.upper().find('<EOH>')
-    if eoh_pos >= 0:
-        content = content[eoh_pos + 5:]
-    
-    registros = {
-        'entries': [],
-        'record_count': 0,
-        'imported_count': 0,
-        'skipped_count': 0
-    }
+def procesar_contenido_adif(campos_adif, config, registros, vistos=None):
+    """Genera (número de registro, QSO) para cada registro ADIF válido
     
-    while '<EOR>' in content.upper():
-        registros['record_count'] += 1
-        eor_pos = content.upper().find('<EOR>')
-        record = content[:eor_pos].strip()
-        content = content[eor_pos + 5:]
+    'campos_adif' genera un diccionario por registro, como los de leer_campos_origen_adif. Los registros leídos y descartados se cuentan en 'registros'.
+    Con 'vistos' se descartan los repetidos dentro del propio archivo; los que ya están en la base los descarta importar_registros_adif.
+    """
+    # El tiempo de cada etapa se acumula en variables locales para no penalizar el bucle;
+    # el que pasa fuera del generador (la inserción del lote) no se cuenta
+    reloj = time.perf_counter
+    lectura = validacion = conversion = 0.0
+    leidos = convertidos = 0
+    
+    try:
+        marca = reloj()
+        for fields in campos_adif:
+            ahora = reloj()
+            lectura += ahora - marca
+            marca = ahora
+            leidos += 1
+            registros['record_count'] += 1
+            
+            valido = validar_campos_obligatorios(fields, registros['record_count'])
+            ahora = reloj()
+            validacion += ahora - marca
+            marca = ahora
+            if not valido:
+                registros['skipped_count'] += 1
+                continue
+            
+            qso = procesar_registro_adif(fields, registros['record_count'], config, vistos)
+            ahora = reloj()
+            conversion += ahora - marca
+            convertidos += 1
+            if qso:
+                yield registros['record_count'], qso
+            else:
+                registros['skipped_count'] += 1
+            marca = reloj()
         
-        fields = extraer_campos_adif(record)
-        if not validar_campos_obligatorios(fields, registros['record_count']):
-            registros['skipped_count'] += 1
-            continue
+        lectura += reloj() - marca
+    finally:
+        sumar_metrica('lectura_adif', lectura, leidos)
+        sumar_metrica('validacion', validacion, leidos)
+        sumar_metrica('conversion_y_duplicados', conversion, convertidos)
+
+def leer_campos_origen_adif(origen, tags=None):
+    """Genera los campos de cada registro de un origen ADIF: archivo, comprimido, .zip o entrada estándar
+    
+    Los comprimidos (.gz, .bz2, .xz), los miembros .adi/.adif de un .zip y la entrada
+    estándar se descomprimen y analizan por bloques, sin extraer nada a disco; los
+    archivos planos se mapean en memoria.
+    """
+    if origen == ENTRADA_ESTANDAR:
+        yield from leer_campos_adif_flujo(sys.stdin.buffer, tags)
+    elif origen.lower().endswith('.zip'):
+        import zipfile
         
-        registro = procesar_registro_adif(fields, registros['record_count'])
-        if registro:
-            registros['entries'].append(registro)
-        else:
-            registros['skipped_count'] += 1
+        with zipfile.ZipFile(origen) as zf:
+            for miembro in zf.infolist():
+                if miembro.is_dir() or not miembro.filename.lower().endswith(EXTENSIONES_ADIF):
+                    continue
+                print(f"- {miembro.filename}")
+                with zf.open(miembro) as f:
+                    yield from leer_campos_adif_flujo(f, tags)
+    elif compresion_de_archivo(origen):
+        with abrir_comprimido(origen, compresion_de_archivo(origen)) as f:
+            yield from leer_campos_adif_flujo(f, tags)
+    else:
+        yield from leer_campos_adif_mmap(origen, tags)
+
+def abrir_comprimido(filename, compresion):
+    """Abre un archivo comprimido como flujo binario que se descomprime al leerlo"""
+    if compresion == 'gz':
+        import gzip
+        return gzip.open(filename, 'rb')
+    if compresion == 'bz2':
+        import bz2
+        return bz2.open(filename, 'rb')
+    if compresion == 'xz':
+        import lzma
+        return lzma.open(filename, 'rb')
+    raise ValueError(f"Compresión desconocida: {compresion}")
+
+def leer_campos_adif_flujo(f, tags=None, tam_bloque=TAM_BLOQUE_ADIF):
+    """Genera los campos de cada registro ADIF de un flujo binario leído por bloques
     
-    return registros
+    Tras cada bloque solo se conserva el registro incompleto, que se vuelve a analizar
+    con el bloque siguiente; la memoria no depende del tamaño del flujo.
+    """
+    buffer = b''
+    cabecera_resuelta = False
+    while True:
+        bloque = f.read(tam_bloque)
+        if not bloque:
+            return
+        buffer += bloque
+        fin_registros = yield from extraer_campos_adif_bytes(buffer, tags, cabecera_resuelta)
+        if fin_registros:
+            cabecera_resuelta = True
+            buffer = buffer[fin_registros:]
+
+def leer_campos_adif_mmap(filename, tags=None):
+    """Genera los campos de cada registro de un archivo ADIF mapeado en memoria"""
+    if os.path.getsize(filename) == 0:
+        return
+    
+    with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as datos:
+        yield from extraer_campos_adif_bytes(datos, tags)
 
-def extraer_campos_adif(record):
-    """Extrae los campos de un registro ADIF"""
+def extraer_campos_adif_bytes(datos, tags=None, cabecera_resuelta=False):
+    """Genera los campos de cada registro ADIF contenido en un buffer de bytes
+    
+    Las longitudes de los campos se cuentan en bytes, como indica ADIF, y solo se
+    decodifican los valores de 'tags' (todos si es None). Retorna la posición tras el
+    último <EOR>, donde empieza el registro incompleto si el buffer acaba a medias.
+    """
+    buscar_inicio_tag = datos.find
+    # Texto del tag (p. ej. b'<CALL:6>') -> (campo o None si no se decodifica, longitud)
+    tags_vistos = {}
     fields = {}
+    fin_registros = 0
     pos = 0
     
-    while pos < len(record):
-        if record[pos] != '<':
-            pos += 1
+    for m in RE_TAG_ADIF.finditer(datos):
+        inicio, fin = m.span()
+        # Lo que parece un tag dentro de un valor con longitud no lo es
+        if inicio < pos:
             continue
-            
-        end_tag = record.find('>', pos)
-        if end_tag == -1:
-            break
-            
-        tag_info = record[pos + 1:end_tag]
-        colon_pos = tag_info.find(':')
+        pos = fin
         
-        if colon_pos == -1:
-            tag = tag_info.upper()
-            length = None
+        texto = m.group()
+        if texto in tags_vistos:
+            clave, length = tags_vistos[texto]
         else:
-            tag = tag_info[:colon_pos].upper()
+            tag, length = m.groups()
+            tag = tag.upper()
             try:
-                length = int(tag_info[colon_pos + 1:])
+                length = int(length) if length else 0
             except ValueError:
-                length = None
+                length = 0
+            clave = tag.decode('ascii', 'ignore') if tags is None or tag in tags or tag in (b'EOR', b'EOH') else None
+            tags_vistos[texto] = (clave, length)
         
-        pos = end_tag + 1
+        if clave == 'EOR':
+            yield fields
+            fields = {}
+            cabecera_resuelta = True
+            fin_registros = fin
+            continue
+        if clave == 'EOH' and not cabecera_resuelta:
+            # Lo leído hasta aquí era la cabecera
+            fields = {}
+            cabecera_resuelta = True
+            continue
         
-        if length is not None and length > 0:
-            value = record[pos:pos + length]
+        if length > 0:
             pos += length
         else:
-            next_tag = record.find('<', pos)
-            if next_tag == -1:
-                value = record[pos:]
-                pos = len(record)
-            else:
-                value = record[pos:next_tag]
-                pos = next_tag
+            pos = buscar_inicio_tag(b'<', pos)
+            if pos == -1:
+                pos = len(datos)
         
-        fields[tag] = value.strip()
+        if clave is not None:
+            fields[clave] = datos[fin:pos].decode('utf-8', 'ignore').strip()
     
-    return fields
+    return fin_registros
 
 def validar_campos_obligatorios(fields, record_count):
     """Valida que el registro ADIF tenga los campos obligatorios"""
@@ -578,87 +2830,140 @@ def validar_campos_obligatorios(fields, record_count):
         return False
     return True
 
-def procesar_registro_adif(fields, record_count):
-    """Procesa un registro ADIF individual"""
+def procesar_registro_adif(fields, record_count, config, vistos=None):
+    """Procesa un registro ADIF individual descartando los duplicados de 'vistos'"""
     try:
-        timestamp = generar_timestamp_adif(fields['QSO_DATE'], fields['TIME_ON'])
+        timestamp, ts_epoch = generar_timestamp_adif(fields['QSO_DATE'], fields['TIME_ON'])
     except ValueError as e:
         print(f"[WARN] Registro #{record_count} - Error en fecha/hora: {e}")
         return None
     
-    config = cargar_configuracion()
     contact_call = fields['CALL'].upper()
     
-    if registro_existente(contact_call, timestamp):
-        print(f"[INFO] Registro #{record_count} ya existe: {contact_call} a las {timestamp[:19]}")
+    if vistos is not None and es_duplicado(contact_call, ts_epoch, record_count, vistos):
         return None
     
-    return {
-        'my_call': config['my_call'],
-        'contact_call': contact_call,
-        'band': fields['BAND'].lower(),
-        'mode': fields['MODE'].upper(),
-        'timestamp': timestamp,
-        'frequency': float(fields['FREQ']) if 'FREQ' in fields else None,
-        'rst_sent': fields.get('RST_SENT'),
-        'rst_received': fields.get('RST_RCVD'),
-        'comment': fields.get('COMMENT') or fields.get('QSLMSG') or fields.get('QSLMSG_INTL'),
-        'qth': fields.get('QTH'),
-        'name': fields.get('NAME'),
-        'grid_locator': fields.get('GRIDSQUARE', '').upper()[:6],
-        'power': float(fields['TX_PWR']) if 'TX_PWR' in fields else None
-    }
+    return QSO(
+        my_call=config['my_call'],
+        contact_call=contact_call,
+        frequency=float(fields['FREQ']) if 'FREQ' in fields else None,
+        band=fields['BAND'].lower(),
+        mode=fields['MODE'].upper(),
+        timestamp=timestamp,
+        rst_sent=fields.get('RST_SENT'),
+        rst_received=fields.get('RST_RCVD'),
+        comment=fields.get('COMMENT') or fields.get('QSLMSG') or fields.get('QSLMSG_INTL'),
+        qth=fields.get('QTH'),
+        name=fields.get('NAME'),
+        grid_locator=fields.get('GRIDSQUARE', '').upper()[:6],
+        power=float(fields['TX_PWR']) if 'TX_PWR' in fields else None,
+        ts_epoch=ts_epoch
+    )
+
+def es_duplicado(contact_call, ts_epoch, record_count, vistos):
+    """Indica si el contacto ya está en 'vistos' y, si no lo está, lo añade"""
+    clave = (contact_call, ts_epoch)
+    if clave in vistos:
+        print(f"[INFO] Registro #{record_count} ya existe: {contact_call} a las {timestamp_de_epoch(ts_epoch)}")
+        return True
+    vistos.add(clave)
+    return False
 
 def generar_timestamp_adif(qso_date, time_on):
-    """Genera un timestamp a partir de los campos ADIF"""
-    time_on_padded = time_on.ljust(6, '0')[:6]
-    dt = datetime.datetime.strptime(f"{qso_date}{time_on_padded}", '%Y%m%d%H%M%S')
-    return dt.strftime('%Y-%m-%d %H:%M:%S')
+    """Retorna (timestamp, ts_epoch) a partir de los campos ADIF, sin pasar por datetime
+    
+    Lanza ValueError si la fecha o la hora no son válidas.
+    """
+    hora = time_on.ljust(6, '0')[:6]
+    if len(qso_date) != 8 or not (qso_date + hora).isdigit():
+        raise ValueError(f"fecha u hora no válida: {qso_date} {time_on}")
+    anio, mes, dia = int(qso_date[0:4]), int(qso_date[4:6]), int(qso_date[6:8])
+    horas, minutos, segundos = int(hora[0:2]), int(hora[2:4]), int(hora[4:6])
+    if not (1 <= mes <= 12 and 1 <= dia <= calendar.monthrange(anio, mes)[1]
+            and horas < 24 and minutos < 60 and segundos < 60):
+        raise ValueError(f"fecha u hora no válida: {qso_date} {time_on}")
+    timestamp = f"{qso_date[0:4]}-{qso_date[4:6]}-{qso_date[6:8]} {hora[0:2]}:{hora[2:4]}:{hora[4:6]}"
+    return timestamp, calendar.timegm((anio, mes, dia, horas, minutos, segundos))
 
-def registro_existente(contact_call, timestamp):
-    """Verifica si un registro ya existe en la base de datos"""
-    with conexion_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT COUNT(*) FROM logbook 
-            WHERE contact_call = ? AND timestamp = ?
-        ''', (contact_call, timestamp[:19]))
-        return cursor.fetchone()[0] > 0
+def epoch_de_timestamp(timestamp):
+    """Convierte 'YYYY-MM-DD HH:MM:SS' (UTC) en segundos desde 1970"""
+    return calendar.timegm((int(timestamp[0:4]), int(timestamp[5:7]), int(timestamp[8:10]),
+                            int(timestamp[11:13]), int(timestamp[14:16]), int(timestamp[17:19])))
 
-def importar_registros_adif(registros):
-    """Importa los registros ADIF a la base de datos"""
+def timestamp_de_epoch(ts_epoch):
+    """Convierte segundos UTC desde 1970 en 'YYYY-MM-DD HH:MM:SS' para mostrarlos"""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(ts_epoch))
+
+def descartar_registrados(cursor, lote, registros, informar=True):
+    """Retorna los (número de registro, QSO) de 'lote' que no están ya en el historial
+    
+    Las claves del lote se consultan juntas en la base, dentro de la transacción en curso,
+    así que también se ven los lotes anteriores de la misma importación. Los descartados
+    se cuentan en 'registros'.
+    """
+    cursor.execute('DELETE FROM temp.claves_importacion')
+    cursor.executemany('INSERT INTO temp.claves_importacion VALUES (?, ?)',
+                       ((qso.contact_call, qso.ts_epoch) for _, qso in lote))
+    registradas = set(cursor.execute(SQL_CLAVES_REGISTRADAS))
+    if not registradas:
+        return lote
+    
+    nuevos = []
+    for numero, qso in lote:
+        if (qso.contact_call, qso.ts_epoch) in registradas:
+            registros['skipped_count'] += 1
+            if informar:
+                print(f"[INFO] Registro #{numero} ya existe: {qso.contact_call} a las {timestamp_de_epoch(qso.ts_epoch)}")
+        else:
+            nuevos.append((numero, qso))
+    return nuevos
+
+def importar_registros_adif(qsos, registros, tam_lote=TAM_LOTE_IMPORTACION, informar=True):
+    """Importa una secuencia de (número de registro, QSO) a la base de datos por lotes en una única transacción
+    
+    'qsos' puede ser un generador: solo se mantiene en memoria el lote en curso. Los
+    contactos que ya están en el historial se omiten (ver descartar_registrados).
+    """
+    qsos = iter(qsos)
     with conexion_db() as conn:
         cursor = conn.cursor()
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS claves_importacion (contact_call TEXT, ts_epoch INTEGER)')
+        cursor.execute('BEGIN')
         
-        for entry in registros['entries']:
-            try:
-                cursor.execute('''
-                    INSERT INTO logbook 
-                    (my_call, contact_call, frequency, band, mode, timestamp, 
-                    rst_sent, rst_received, comment, qth, name, grid_locator, power)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    entry['my_call'],
-                    entry['contact_call'],
-                    entry.get('frequency'),
-                    entry['band'],
-                    entry['mode'],
-                    entry['timestamp'],
-                    entry.get('rst_sent'),
-                    entry.get('rst_received'),
-                    entry.get('comment'),
-                    entry.get('qth'),
-                    entry.get('name'),
-                    entry.get('grid_locator'),
-                    entry.get('power')
-                ))
-                registros['imported_count'] += 1
-            except sqlite3.Error as e:
-                print(f"[ERROR] SQLite: {str(e)}")
+        while True:
+            lote = list(islice(qsos, tam_lote))
+            if not lote:
+                break
+            
+            with medir_etapa('duplicados_base', len(lote)):
+                lote = descartar_registrados(cursor, lote, registros, informar)
+            if not lote:
                 continue
-        
-        conn.commit()
+            
+            with medir_etapa('geometria', len(lote)):
+                lote = completar_geometria([qso for _, qso in lote])
+            
+            with medir_etapa('insercion', len(lote)):
+                cursor.execute('SAVEPOINT lote_adif')
+                try:
+                    cursor.executemany(SQL_INSERTAR_QSO, lote)
+                    registros['imported_count'] += len(lote)
+                except sqlite3.Error:
+                    # Se deshace el lote y se reintenta fila a fila para contar solo las erróneas
+                    cursor.execute('ROLLBACK TO lote_adif')
+                    for qso in lote:
+                        try:
+                            cursor.execute(SQL_INSERTAR_QSO, qso)
+                            registros['imported_count'] += 1
+                        except sqlite3.Error as e:
+                            print(f"[ERROR] SQLite: {str(e)}")
+                cursor.execute('RELEASE lote_adif')
     
+    if not informar:
+        return
+    if registros['record_count'] == registros['skipped_count']:
+        print("\nNo se encontraron registros válidos para importar")
+        return
     print(f"\nResultados de importación:")
     print(f"- Total registros en archivo: {registros['record_count']}")
     print(f"- Registros nuevos importados: {registros['imported_count']}")
@@ -683,6 +2988,7 @@ def configurar_estacion():
     config['grid_locator'] = obtener_grid_locator_valido(config['grid_locator'])
     config['antenna'] = input(f"Antena [{config['antenna']}]: ").strip() or config['antenna']
     config['equipment'] = input(f"Equipo [{config['equipment']}]: ").strip() or config['equipment']
+    config['iaru_region'] = obtener_region_iaru_valida(config['iaru_region'])
     
     guardar_configuracion(config)
     print("\n¡Configuración guardada correctamente!")
@@ -693,4 +2999,12 @@ def obtener_grid_locator_valido(valor_actual):
         grid = input(f"Grid Locator (ej. GF15vc) [{valor_actual}]: ").strip().upper() or valor_actual
         if not grid or (len(grid) >= 4 and grid[0:2].isalpha() and grid[2:4].isdigit()):
             return grid
-        print("Grid Locator debe tener al menos 4 caracteres (2 letras + 2 números)")
\ No newline at end of file
+        print("Grid Locator debe tener al menos 4 caracteres (2 letras + 2 números)")
+
+def obtener_region_iaru_valida(valor_actual):
+    """Solicita la región IARU (1, 2 o 3) que define el plan de bandas"""
+    while True:
+        region = input(f"Región IARU (1, 2 o 3) [{valor_actual}]: ").strip() or valor_actual
+        if region in PLANES_BANDA:
+            return region
+        print("La región IARU debe ser 1, 2 o 3")
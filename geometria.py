@@ -0,0 +1,108 @@
+# HamRadio Logbook - Geometría de locators Maidenhead: coordenadas, distancia y rumbo
+
+#### IMPORTAR MÓDULOS ####
+import math
+import re
+from functools import lru_cache
+
+#### CONSTANTES ####
+RADIO_TIERRA_KM = 6371.0
+RE_LOCATOR = re.compile(r'^[A-R]{2}(?:[0-9]{2}(?:[A-X]{2}(?:[0-9]{2})?)?)?$')
+TAM_MINIMO_NUMPY = 256  # Por debajo de este lote el cálculo en Python puro es más rápido
+TAM_CACHE = 65536  # Locators y pares de locators recordados
+
+#### COORDENADAS ####
+@lru_cache(maxsize=TAM_CACHE)
+def locator_a_coordenadas(locator):
+    """Retorna (latitud, longitud) en grados del centro del locator, o None si no es válido
+    
+    Admite locators de 2, 4, 6 u 8 caracteres, sin distinguir mayúsculas.
+    """
+    locator = (locator or '').strip().upper()
+    if not RE_LOCATOR.match(locator):
+        return None
+    
+    # Campo (20° x 10°), cuadrado (2° x 1°), subcuadrado (5' x 2,5') y cuadrado extendido (30" x 15")
+    longitud = (ord(locator[0]) - 65) * 20.0 - 180.0
+    latitud = (ord(locator[1]) - 65) * 10.0 - 90.0
+    ancho, alto = 20.0, 10.0
+    if len(locator) >= 4:
+        longitud += int(locator[2]) * 2.0
+        latitud += int(locator[3]) * 1.0
+        ancho, alto = 2.0, 1.0
+    if len(locator) >= 6:
+        longitud += (ord(locator[4]) - 65) * 5.0 / 60
+        latitud += (ord(locator[5]) - 65) * 2.5 / 60
+        ancho, alto = 5.0 / 60, 2.5 / 60
+    if len(locator) == 8:
+        longitud += int(locator[6]) * 0.5 / 60
+        latitud += int(locator[7]) * 0.25 / 60
+        ancho, alto = 0.5 / 60, 0.25 / 60
+    return latitud + alto / 2, longitud + ancho / 2
+
+def coordenadas_locators(locators):
+    """Convierte una secuencia de locators en una lista de (latitud, longitud) o None"""
+    return [locator_a_coordenadas(locator) if locator else None for locator in locators]
+
+#### DISTANCIA Y RUMBO ####
+@lru_cache(maxsize=TAM_CACHE)
+def distancia_rumbo(origen, destino):
+    """Retorna (km, rumbo en grados) por círculo máximo entre dos locators, o (None, None)"""
+    desde = locator_a_coordenadas(origen)
+    hasta = locator_a_coordenadas(destino)
+    if desde is None or hasta is None:
+        return None, None
+    
+    lat1, lon1 = math.radians(desde[0]), math.radians(desde[1])
+    lat2, lon2 = math.radians(hasta[0]), math.radians(hasta[1])
+    dlon = lon2 - lon1
+    
+    # Haversine para la distancia y rumbo inicial de la ortodrómica
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+    km = 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+    rumbo = math.degrees(math.atan2(math.sin(dlon) * math.cos(lat2),
+                                    math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlon)))
+    return round(km, 1), round(rumbo % 360, 1)
+
+def distancias_rumbos(origen, destinos):
+    """Retorna (km, rumbo) desde el locator 'origen' a cada locator de 'destinos'
+    
+    Con NumPy instalado los lotes grandes se calculan vectorizados; si no, cada par
+    se calcula una vez y se recuerda. Los locators no válidos dan (None, None).
+    """
+    destinos = list(destinos)
+    if locator_a_coordenadas(origen) is None:
+        return [(None, None)] * len(destinos)
+    
+    if len(destinos) >= TAM_MINIMO_NUMPY:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        if numpy is not None:
+            return distancias_rumbos_numpy(numpy, origen, destinos)
+    
+    return [distancia_rumbo(origen, destino) if destino else (None, None) for destino in destinos]
+
+def distancias_rumbos_numpy(numpy, origen, destinos):
+    """Calcula distancias_rumbos con NumPy sobre los locators distintos del lote"""
+    # Los logs repiten mucho los locators: se calcula cada uno una sola vez
+    unicos = list({destino for destino in destinos if destino})
+    coordenadas = coordenadas_locators(unicos)
+    validos = [(locator, c) for locator, c in zip(unicos, coordenadas) if c is not None]
+    if not validos:
+        return [(None, None)] * len(destinos)
+    
+    lat1, lon1 = numpy.radians(locator_a_coordenadas(origen))
+    puntos = numpy.radians(numpy.array([c for _, c in validos]))
+    lat2, lon2 = puntos[:, 0], puntos[:, 1]
+    dlon = lon2 - lon1
+    
+    a = numpy.sin((lat2 - lat1) / 2) ** 2 + numpy.cos(lat1) * numpy.cos(lat2) * numpy.sin(dlon / 2) ** 2
+    km = 2 * RADIO_TIERRA_KM * numpy.arcsin(numpy.minimum(1.0, numpy.sqrt(a)))
+    rumbo = numpy.degrees(numpy.arctan2(numpy.sin(dlon) * numpy.cos(lat2),
+                                        numpy.cos(lat1) * numpy.sin(lat2) - numpy.sin(lat1) * numpy.cos(lat2) * numpy.cos(dlon)))
+    
+    resultados = dict(zip((locator for locator, _ in validos),
+                          zip(numpy.round(km, 1).tolist(), numpy.round(rumbo % 360, 1).tolist())))
+    return [resultados.get(destino, (None, None)) if destino else (None, None) for destino in destinos]
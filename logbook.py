@@ -1,8 +1,11 @@
 # HamRadio Logbook - Punto de entrada principal
 
 #### Importar módulos ####
+import sys
 import funciones
 
 #### Bucle principal ####
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(funciones.ejecutar_comando(sys.argv[1:]))
     funciones.iniciar_aplicacion()
\ No newline at end of file
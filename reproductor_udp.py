@@ -0,0 +1,93 @@
+# HamRadio Logbook - Reproductor de datagramas UDP para pruebas de carga del servicio
+
+#### IMPORTAR MÓDULOS ####
+import argparse
+import socket
+import struct
+import sys
+import time
+
+import funciones
+
+#### CONSTANTES ####
+CABECERA_CAPTURA = struct.Struct('>dI')  # Instante de recepción y longitud de cada datagrama
+
+#### GENERACIÓN DE DATAGRAMAS ####
+def utf8_qt(texto):
+    """Serializa una cadena como lo hace Qt: longitud de 32 bits y bytes UTF-8"""
+    datos = texto.encode('utf-8')
+    return struct.pack('>I', len(datos)) + datos
+
+def mensaje_logged_adif(campos, id_cliente='WSJT-X'):
+    """Construye un mensaje 'Logged ADIF' de WSJT-X con los campos de un contacto"""
+    registro = ''.join(f"<{tag}:{len(valor.encode('utf-8'))}>{valor} " for tag, valor in campos.items())
+    adif = f"\n<adif_ver:5>3.1.0\n<programid:6>WSJT-X\n<EOH>\n{registro}<EOR>\n"
+    return (struct.pack('>III', funciones.WSJTX_MAGIC, 2, funciones.WSJTX_LOGGED_ADIF) +
+            utf8_qt(id_cliente) + utf8_qt(adif))
+
+def leer_captura(ruta):
+    """Genera (instante, datagrama) de un archivo creado con 'logbook.py serve --capture'"""
+    with open(ruta, 'rb') as f:
+        while True:
+            cabecera = f.read(CABECERA_CAPTURA.size)
+            if len(cabecera) < CABECERA_CAPTURA.size:
+                return
+            instante, longitud = CABECERA_CAPTURA.unpack(cabecera)
+            yield instante, f.read(longitud)
+
+def datagramas_adif(ruta, tasa):
+    """Genera (instante, datagrama) con un contacto de un archivo ADIF por datagrama"""
+    for numero, campos in enumerate(funciones.leer_campos_adif_mmap(ruta)):
+        yield (numero / tasa if tasa else 0.0), mensaje_logged_adif(campos)
+
+#### ENVÍO ####
+def reproducir(datagramas, destino, velocidad):
+    """Envía los datagramas respetando sus intervalos divididos por 'velocidad' (0 = sin pausas)"""
+    enviados = 0
+    inicio_envio = time.perf_counter()
+    primer_instante = None
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for instante, datos in datagramas:
+            if primer_instante is None:
+                primer_instante = instante
+            if velocidad:
+                espera = (instante - primer_instante) / velocidad - (time.perf_counter() - inicio_envio)
+                if espera > 0:
+                    time.sleep(espera)
+            sock.sendto(datos, destino)
+            enviados += 1
+    return enviados, time.perf_counter() - inicio_envio
+
+#### PUNTO DE ENTRADA ####
+def main(argv=None):
+    """Reproduce una captura o un archivo ADIF contra el servicio UDP del logbook"""
+    parser = argparse.ArgumentParser(description="Envía datagramas de WSJT-X o N1MM al servicio UDP del logbook")
+    origen = parser.add_mutually_exclusive_group(required=True)
+    origen.add_argument('--captura', help="Archivo creado con 'logbook.py serve --capture'")
+    origen.add_argument('--adif', help="Archivo ADIF; cada contacto se envía como 'Logged ADIF' de WSJT-X")
+    parser.add_argument('--host', default=funciones.HOST_UDP, help=f"Destino (por defecto, {funciones.HOST_UDP})")
+    parser.add_argument('--puerto', type=int, default=funciones.PUERTO_WSJTX, help="Puerto UDP de destino")
+    parser.add_argument('--velocidad', type=float, default=1.0,
+                        help="Factor de aceleración respecto al ritmo original; 0 envía sin pausas")
+    parser.add_argument('--tasa', type=float, default=0,
+                        help="Contactos por segundo al enviar un ADIF (por defecto, sin pausas)")
+    parser.add_argument('--repeticiones', type=int, default=1, help="Veces que se reproduce el origen")
+    args = parser.parse_args(argv)
+
+    total = 0
+    segundos = 0.0
+    for _ in range(args.repeticiones):
+        if args.captura:
+            enviados, duracion = reproducir(leer_captura(args.captura), (args.host, args.puerto), args.velocidad)
+        else:
+            enviados, duracion = reproducir(datagramas_adif(args.adif, args.tasa), (args.host, args.puerto),
+                                            1.0 if args.tasa else 0)
+        total += enviados
+        segundos += duracion
+
+    print(f"Enviados {total} datagramas en {segundos:.2f} s "
+          f"({total / segundos if segundos else 0:.0f} por segundo)", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
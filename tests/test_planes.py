@@ -0,0 +1,62 @@
+# HamRadio Logbook - Pruebas de los planes de consulta
+
+#### IMPORTAR MÓDULOS ####
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+import funciones
+
+#### CONSTANTES ####
+REGISTROS_PRUEBA = 500
+ANIO_ARCHIVADO = 2015  # El log sintético empieza en 2015
+
+#### PRUEBAS ####
+class PruebaPlanesConsulta(unittest.TestCase):
+    """Los filtros de FILTROS_INDEXADOS usan un índice en la base principal y en cada archivo anual"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directorio = tempfile.TemporaryDirectory()
+        cls.db_original = funciones.DB_NAME
+        funciones.cerrar_conexiones()
+        funciones.DB_NAME = os.path.join(cls.directorio.name, 'planes.db')
+        ruta_adif = os.path.join(cls.directorio.name, 'sintetico.adi')
+        benchmark.generar_adif(ruta_adif, REGISTROS_PRUEBA)
+        with contextlib.redirect_stdout(io.StringIO()):
+            funciones.preparar_base()
+            funciones.importar_archivo_adif(ruta_adif)
+            funciones.archivar_anio(ANIO_ARCHIVADO)
+
+    @classmethod
+    def tearDownClass(cls):
+        funciones.cerrar_conexiones()
+        funciones.DB_NAME = cls.db_original
+        cls.directorio.cleanup()
+
+    def test_archivo_adjunto(self):
+        esquemas = [fila[1] for fila in funciones.conexion_db().execute('PRAGMA database_list')]
+        self.assertIn(f'archivo_{ANIO_ARCHIVADO}', esquemas)
+
+    def test_filtros_indexados(self):
+        planes, sin_indice = benchmark.comprobar_planes()
+        self.assertEqual(sin_indice, [], {nombre: planes[nombre] for nombre in sin_indice})
+        for nombre, plan in planes.items():
+            with self.subTest(filtro=nombre):
+                self.assertTrue(any(f'archivo_{ANIO_ARCHIVADO}.logbook' in paso for paso in plan), plan)
+
+    def test_detecta_recorrido_completo(self):
+        # Sin índice por modo, este filtro recorre cada tabla: la comprobación debe notarlo
+        sql, params = funciones.consulta_filtrada({'modos': ['CW']})
+        plan = [fila[3] for fila in funciones.conexion_db().execute('EXPLAIN QUERY PLAN ' + sql, params)]
+        self.assertTrue(any(benchmark.RE_RECORRIDO_COMPLETO.match(paso) for paso in plan), plan)
+
+
+if __name__ == '__main__':
+    unittest.main()